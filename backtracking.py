@@ -6,6 +6,7 @@ Date: 15/01/2023
 
 Implementation of naive brute force with backtracking sudoku solver algorithm.
 """
+from typing import Iterator
 import sudokuPuzzleUtils as spu
 
 def findRandom(puzzle: list[list[int]]) -> tuple[int, int] | None:
@@ -47,6 +48,9 @@ def findByCol(puzzle: list[list[int]]) -> tuple[int, int] | None:
     
     return None
 
+# Order in which boxes are searched by the fixed box search modes
+BOX_ORDERS = {4: range(0,9), 5: [0,1,2,5,4,3,6,7,8], 6: [0,1,2,5,8,7,6,3,4], 7: [0,1,4,3,6,7,8,5,2], 9: [0,4,8,1,2,3,5,6,7]}
+
 def findByBox(puzzle: list[list[int]], mode: int) -> tuple[int, int] | None:
     """
     Finds the next empty cell searching first by box then by row.
@@ -60,28 +64,176 @@ def findByBox(puzzle: list[list[int]], mode: int) -> tuple[int, int] | None:
     """
     import random
 
-    if mode==4:
-        boxes=range(0,9)
-    elif mode==5:
-        boxes=[0,1,2,5,4,3,6,7,8]
-    elif mode==6:
-        boxes=[0,1,2,5,8,7,6,3,4]
-    elif mode==7:
-        boxes=[0,1,4,3,6,7,8,5,2]
-    elif mode==8:
+    if mode==8:
         boxes=random.sample(range(0,9),9)
-    elif mode==9:
-        boxes=[0,4,8,1,2,3,5,6,7]
+    elif mode in BOX_ORDERS:
+        boxes=BOX_ORDERS[mode]
     else: return None
 
     for box in boxes:
-        for row in range((box//3)*3,((box//3)*3)+3):
-            for col in range((box%3)*3, ((box%3)*3)+3):
-                if puzzle[row][col]==0:
-                    return (row, col)
+        for row, col in spu.BOX_POSITIONS[box]:
+            if puzzle[row][col]==0:
+                return (row, col)
 
     return None
 
+# Order in which all cells are visited by the fixed search modes
+SEARCH_ORDERS = {1: spu.CELLS, 2: sum(spu.COL_POSITIONS, ())}
+SEARCH_ORDERS.update({mode: sum((spu.BOX_POSITIONS[box] for box in boxes), ()) for mode, boxes in BOX_ORDERS.items()})
+
+def getSearchOrder(puzzle: list[list[int]], search: int) -> list[tuple[int, int]] | None:
+    """
+    Gets the empty cells of a puzzle in the order a fixed search mode visits them. Since such a search always
+    fills the first empty cell in its order, and cells are emptied again in reverse order, the n-th guess is
+    always made in the n-th cell returned. Returns None for the random and most constrained modes.
+    Arguments:
+        puzzle: a 9x9 sudoku puzzle
+        search: the search mode, as in findEmpty.
+    """
+    cells = SEARCH_ORDERS.get(search)
+    if cells is None:
+        return None
+
+    return [pos for pos in cells if puzzle[pos[0]][pos[1]]==0]
+
+class ConstrainedCells(spu.BoardState):
+    """
+    A board state that also keeps the number of remaining candidates of every empty cell up to date as values are
+    placed and removed, so the most constrained cell is found without rescanning the board. Cells are kept in
+    buckets by their candidate count.
+    """
+    def __init__(self, board: list[list[int]], validValues: dict[tuple[int, int], int]):
+        super().__init__(board)
+        self.validValues = validValues
+        self.counts = dict[tuple[int, int], int]()
+        self.degrees = dict[tuple[int, int], int]()
+        self.buckets = [set[tuple[int, int]]() for _ in range(0,10)]
+
+        for row in range(0,9):
+            for col in range(0,9):
+                if board[row][col]==0:
+                    self.addCell((row, col))
+
+    def getCandidates(self, pos: tuple[int, int]) -> int:
+        """
+        Gets the candidate mask of a cell, excluding digits already placed in its row, column or box.
+        Arguments:
+            pos: the row and column position.
+        """
+        return self.validValues.get(pos, 0) & ~self.getUsed(pos)
+
+    def addCell(self, pos: tuple[int, int]):
+        """
+        Starts tracking an empty cell.
+        Arguments:
+            pos: the row and column position.
+        """
+        count = spu.MASK_COUNT[self.getCandidates(pos)]
+        self.counts[pos] = count
+        self.buckets[count].add(pos)
+
+        degree = 0
+        for peer in spu.PEERS[pos]:
+            if peer in self.counts:
+                degree += 1
+                self.degrees[peer] += 1
+        self.degrees[pos] = degree
+
+    def removeCell(self, pos: tuple[int, int]):
+        """
+        Stops tracking a cell that has been filled.
+        Arguments:
+            pos: the row and column position.
+        """
+        self.buckets[self.counts.pop(pos)].discard(pos)
+        del self.degrees[pos]
+
+        for peer in spu.PEERS[pos]:
+            if peer in self.counts:
+                self.degrees[peer] -= 1
+
+    def updatePeers(self, pos: tuple[int, int], bit: int):
+        """
+        Recounts the candidates of the empty peers of a cell which have a digit as candidate.
+        Arguments:
+            pos: the row and column position that changed.
+            bit: the mask of the digit placed or removed.
+        """
+        for peer in spu.PEERS[pos]:
+            old = self.counts.get(peer)
+            if old is None or not self.validValues.get(peer, 0) & bit:
+                continue
+
+            new = spu.MASK_COUNT[self.getCandidates(peer)]
+            if new != old:
+                self.buckets[old].discard(peer)
+                self.buckets[new].add(peer)
+                self.counts[peer] = new
+
+    def place(self, pos: tuple[int, int], val: int):
+        """
+        Places a value in an empty cell and recounts its peers.
+        Arguments:
+            pos: the row and column position.
+            val: the value placed.
+        """
+        super().place(pos, val)
+        self.removeCell(pos)
+        self.updatePeers(pos, spu.DIGIT_MASK[val])
+
+    def unplace(self, pos: tuple[int, int]) -> int:
+        """
+        Clears a cell, recounts its peers and returns the value it held.
+        Arguments:
+            pos: the row and column position.
+        """
+        val = super().unplace(pos)
+        self.updatePeers(pos, spu.DIGIT_MASK[val])
+        self.addCell(pos)
+
+        return val
+
+    def findMostConstrained(self, mode: int) -> tuple[int, int] | None:
+        """
+        Finds the empty cell with the fewest remaining candidates.
+        Arguments:
+            mode:   10 breaks ties by taking the first cell in row order,
+                    11 breaks ties by taking the cell with most empty peers,
+                    12 breaks ties randomly.
+        """
+        for bucket in self.buckets:
+            if not bucket:
+                continue
+
+            if mode==11:
+                return min(bucket, key=lambda pos: (-self.degrees[pos], pos))
+            elif mode==12:
+                import random
+                return random.choice(tuple(bucket))
+
+            return min(bucket)
+
+        return None
+
+def isMostConstrainedMode(search: int) -> bool:
+    """
+    Checks if a search mode picks the most constrained cell.
+    Arguments:
+        search: the search mode.
+    """
+    return search>=10 and search<=12
+
+def findMostConstrained(puzzle: list[list[int]], mode: int) -> tuple[int, int] | None:
+    """
+    Finds the empty cell with the fewest allowed values by scanning the puzzle. Used when no
+    ConstrainedCells tracking is available.
+    Arguments:
+        puzzle: a 9x9 sudoku puzzle
+        mode: the tie-breaking mode, as in ConstrainedCells.findMostConstrained.
+    """
+    state = ConstrainedCells(puzzle, spu.cacheValidValues(puzzle))
+    return state.findMostConstrained(mode)
+
 def findEmpty(puzzle: list[list[int]], search: int) -> tuple[int, int] | None:
     """
     Finds the next empty cell in a 9x9 sudoku puzzle.
@@ -97,6 +249,9 @@ def findEmpty(puzzle: list[list[int]], search: int) -> tuple[int, int] | None:
                     7 by box in a semi-zig-zag;
                     8 by box randomly;
                     9 by box diagonal;
+                    10 by most constrained cell, ties in row order;
+                    11 by most constrained cell, ties by most empty peers;
+                    12 by most constrained cell, ties randomly;
     """
     if search==1:
         return findByRow(puzzle)
@@ -106,14 +261,16 @@ def findEmpty(puzzle: list[list[int]], search: int) -> tuple[int, int] | None:
         return findRandom(puzzle)
     elif search>=4 and search<=9:
         return findByBox(puzzle, search)
+    elif isMostConstrainedMode(search):
+        return findMostConstrained(puzzle, search)
     
     return None
 
-def getGuesses(validValues: list[int] | None, guess: int) -> list[int] | None:
+def getGuesses(validValues: int | None, guess: int) -> list[int] | None:
     """
     Gets numbers to guess.
     Arguments:
-        validValues: a dictionary of valid values.
+        validValues: the candidate mask of valid values.
         guess: the guessing mode. 1 for sequential, 2 for random.
     """
     if validValues is None:
@@ -122,24 +279,48 @@ def getGuesses(validValues: list[int] | None, guess: int) -> list[int] | None:
     import random
     
     if guess==1:
-        return validValues
+        return spu.maskToValues(validValues)
     elif guess==2:
-        return random.sample(validValues,len(validValues))
+        vals = spu.maskToValues(validValues)
+        return random.sample(vals,len(vals))
 
     return None
 
-def solve(board: list[list[int]], validValues: dict[tuple[int, int], list[int]], history: list | None, stats: spu.SudokuStats | None, searchMode: int, guessMode: int):
+def solve(board: list[list[int]], validValues: dict[tuple[int, int], int], history: list | None, stats: spu.SudokuStats | None, searchMode: int, guessMode: int, \
+          state: spu.BoardState | None = None):
     """
     Solves a 9x9 sudoku puzzle using backtracking algorithm.
     Arguments:
         board: the 9x9 puzzle to be solved.
+        validValues: the candidate mask for each unsolved cell.
         history: a list containing a history of solutions for tracking.
         stats: The statistics object to record algorithm.
         searchMode: the mode how the next empty cell is found.
         guessMode: the mode how the next number is guessed.
+        state: the board state tracking the values in each row, column and box, created on the first call.
     """
+    if state is None:
+        state = spu.BoardState(board)
+
+    # Fixed search modes know every cell they will fill up front, so no cell is searched for during the guesses
+    order = getSearchOrder(board, searchMode)
+    if order is not None:
+        cells = [(row, col, spu.BOX_OF[(row, col)], validValues.get((row, col))) for row, col in order]
+        return solveInOrder(board, history, stats, guessMode, state, cells, 0)
+
+    # The most constrained search modes also need candidate counts
+    mostConstrained = isMostConstrainedMode(searchMode)
+    if mostConstrained and not isinstance(state, ConstrainedCells):
+        state = ConstrainedCells(board, validValues)
+
     # Find the next empty cell
-    find = findEmpty(board, searchMode)
+    if mostConstrained:
+        find = state.findMostConstrained(searchMode)
+    else:
+        find = findEmpty(board, searchMode)
+
+    if __debug__ and stats is not None:
+        stats.findEmptyScans += 1
 
     # If there is no empty cell than puzzle is complete
     if not find:
@@ -151,33 +332,274 @@ def solve(board: list[list[int]], validValues: dict[tuple[int, int], list[int]],
     if not validValues.__contains__((row,col)):
         return False
 
-    vals = getGuesses(validValues.get((row, col)), guessMode)
+    # Only guess values not yet placed in the row, column and box
+    vals = getGuesses(validValues[(row, col)] & ~state.getUsed((row, col)), guessMode)
     if vals is None:
         return False
+
+    if __debug__ and stats is not None:
+        stats.isValidCalls += 1
         
     for guess in vals:
-        if spu.isValid(board, guess, (row, col)):
+        # Brute force guess
+        if stats is not None:
+            stats.incrementGuesses()
+            if __debug__:
+                stats.registerBranch()
+
+        state.place((row, col), guess)
+
+        if history is not None:
+            history.append(spu.toStr(board))
+
+        # Attempt to solve rest of puzzle with current choice
+        if __debug__ and stats is not None:
+            stats.descend()
+        solved = solve(board, validValues, history, stats, searchMode, guessMode, state)
+        if __debug__ and stats is not None:
+            stats.ascend()
+        if solved:
+            return True
+
+        # Invalid puzzle so backtrack
+        if history is not None:
+            history.remove(spu.toStr(board))
+
+        if stats is not None:
+            stats.incrementBacktracks()
+
+        state.unplace((row, col))
+
+    return False
+
+def solveInOrder(board: list[list[int]], history: list | None, stats: spu.SudokuStats | None, guessMode: int, state: spu.BoardState, \
+                 cells: list[tuple[int, int, int, int | None]], depth: int) -> bool:
+    """
+    Solves a 9x9 sudoku puzzle using backtracking algorithm, filling the empty cells in a fixed order. The n-th
+    guess is always made in the n-th cell, so the cell is looked up by depth and placing a guess only updates the
+    masks of the board state.
+    Arguments:
+        board: the 9x9 puzzle to be solved.
+        history: a list containing a history of solutions for tracking.
+        stats: The statistics object to record algorithm.
+        guessMode: the mode how the next number is guessed.
+        state: the board state tracking the values in each row, column and box.
+        cells: the row, column, box and candidate mask of each empty cell, in the order they are filled.
+        depth: the number of cells already filled by guesses.
+    """
+    if __debug__ and stats is not None:
+        stats.findEmptyScans += 1
+
+    # If there is no empty cell than puzzle is complete
+    if depth == len(cells):
+        return True
+
+    row, col, box, candidates = cells[depth]
+    if candidates is None:
+        return False
+
+    # Only guess values not yet placed in the row, column and box
+    rows, cols, boxes = state.rows, state.cols, state.boxes
+    candidates &= ~(rows[row] | cols[col] | boxes[box])
+    vals = spu.MASK_VALUES[candidates] if guessMode==1 else getGuesses(candidates, guessMode)
+    if vals is None:
+        return False
+
+    if __debug__ and stats is not None:
+        stats.isValidCalls += 1
+
+    boardRow = board[row]
+    for guess in vals:
+        # Brute force guess
+        if stats is not None:
+            stats.incrementGuesses()
+            if __debug__:
+                stats.registerBranch()
+
+        bit = spu.DIGIT_MASK[guess]
+        boardRow[col] = guess
+        rows[row] |= bit
+        cols[col] |= bit
+        boxes[box] |= bit
+
+        if history is not None:
+            history.append(spu.toStr(board))
+
+        # Attempt to solve rest of puzzle with current choice
+        if __debug__ and stats is not None:
+            stats.descend()
+        solved = solveInOrder(board, history, stats, guessMode, state, cells, depth + 1)
+        if __debug__ and stats is not None:
+            stats.ascend()
+        if solved:
+            return True
+
+        # Invalid puzzle so backtrack
+        if history is not None:
+            history.remove(spu.toStr(board))
+
+        if stats is not None:
+            stats.incrementBacktracks()
+
+        boardRow[col] = 0
+        bit = ~bit
+        rows[row] &= bit
+        cols[col] &= bit
+        boxes[box] &= bit
+
+    return False
+
+class BacktrackingSearch:
+    """
+    Non-recursive backtracking search. The recursion of solve is replaced by an explicit stack of
+    (cell, candidate iterator) frames, one for each cell currently filled by a guess. The search can be run a
+    number of steps at a time, so it can be paused, inspected through its stack and resumed. Guesses and
+    backtracks are counted exactly as solve counts them.
+    """
+    def __init__(self, board: list[list[int]], validValues: dict[tuple[int, int], int], history: list | None, stats: spu.SudokuStats | None, \
+                 searchMode: int, guessMode: int, state: spu.BoardState | None = None):
+        self.board = board
+        self.validValues = validValues
+        self.history = history
+        self.stats = stats
+        self.searchMode = searchMode
+        self.guessMode = guessMode
+        self.steps = 0
+        self.solved = None
+        self.stack = list[tuple[tuple[int, int], Iterator[int]]]()
+        self.order = getSearchOrder(board, searchMode)
+
+        if state is None:
+            state = spu.BoardState(board)
+        if isMostConstrainedMode(searchMode) and not isinstance(state, ConstrainedCells):
+            state = ConstrainedCells(board, validValues)
+        self.state = state
+
+        # Open the frame of the first empty cell
+        frame = self.nextFrame()
+        if frame is None:
+            self.solved = True
+        elif frame is False:
+            self.solved = False
+        else:
+            self.stack.append(frame)
+
+    def nextFrame(self) -> tuple[tuple[int, int], Iterator[int]] | bool | None:
+        """
+        Finds the next empty cell and creates its frame. Returns None if there is no empty cell left and False if
+        the cell has nothing to guess.
+        """
+        if self.order is not None:
+            # Fixed orders visit the empty cells in sequence, one per frame
+            depth = len(self.stack)
+            find = self.order[depth] if depth < len(self.order) else None
+        elif isMostConstrainedMode(self.searchMode):
+            find = self.state.findMostConstrained(self.searchMode)
+        else:
+            find = findEmpty(self.board, self.searchMode)
+
+        if __debug__ and self.stats is not None:
+            self.stats.findEmptyScans += 1
+
+        if not find:
+            return None
+
+        vals = self.validValues.get(find)
+        if vals is None:
+            return False
+
+        vals = getGuesses(vals & ~self.state.getUsed(find), self.guessMode)
+        if vals is None:
+            return False
+
+        if __debug__ and self.stats is not None:
+            self.stats.isValidCalls += 1
+
+        return (find, iter(vals))
+
+    def undo(self, pos: tuple[int, int]):
+        """
+        Backtracks the guess in a cell.
+        Arguments:
+            pos: the row and column position of the guess.
+        """
+        if self.history is not None:
+            self.history.remove(spu.toStr(self.board))
+
+        if self.stats is not None:
+            self.stats.incrementBacktracks()
+
+        self.state.unplace(pos)
+
+    def run(self, maxSteps: int | None = None) -> bool | None:
+        """
+        Runs the search until it completes or the number of steps is reached. Returns True if the puzzle was
+        solved, False if it has no solution and None if the search was paused.
+        Arguments:
+            maxSteps: the maximum number of steps to run, None to run to completion.
+        """
+        stack = self.stack
+        history = self.history
+        stats = self.stats
+        board = self.board
+        place = self.state.place
+        steps = 0
+
+        while self.solved is None:
+            if maxSteps is not None and steps >= maxSteps:
+                break
+            steps += 1
+
+            pos, vals = stack[-1]
+            guess = next(vals, None)
+
+            # All guesses failed so backtrack the guess of the previous cell
+            if guess is None:
+                stack.pop()
+                if not stack:
+                    self.solved = False
+                else:
+                    self.undo(stack[-1][0])
+                continue
 
             # Brute force guess
             if stats is not None:
                 stats.incrementGuesses()
+                if __debug__:
+                    # The depth of a guess is the number of guesses below it on the stack
+                    stats.depth = len(stack) - 1
+                    stats.registerBranch()
+                    if len(stack) > stats.maxDepth:
+                        stats.maxDepth = len(stack)
 
-            board[row][col] = guess
+            place(pos, guess)
 
             if history is not None:
                 history.append(spu.toStr(board))
 
-            # Attempt to solve rest of puzzle with current choice
-            if solve(board, validValues, history, stats, searchMode, guessMode):
-                return True
-
-            # Invalid puzzle so backtrack
-            if history is not None:
-                history.remove(spu.toStr(board))
+            # Continue with the next empty cell
+            frame = self.nextFrame()
+            if frame is None:
+                self.solved = True
+            elif frame is False:
+                self.undo(pos)
+            else:
+                stack.append(frame)
 
-            if stats is not None:
-                stats.incrementBacktracks()
+        self.steps += steps
+        return self.solved
 
-            board[row][col] = 0
-
-    return False
\ No newline at end of file
+def solveIterative(board: list[list[int]], validValues: dict[tuple[int, int], int], history: list | None, stats: spu.SudokuStats | None, searchMode: int, guessMode: int, \
+                   state: spu.BoardState | None = None) -> bool:
+    """
+    Solves a 9x9 sudoku puzzle using backtracking algorithm with an explicit stack instead of recursion.
+    Arguments:
+        board: the 9x9 puzzle to be solved.
+        validValues: the candidate mask for each unsolved cell.
+        history: a list containing a history of solutions for tracking.
+        stats: The statistics object to record algorithm.
+        searchMode: the mode how the next empty cell is found.
+        guessMode: the mode how the next number is guessed.
+        state: the board state tracking the values in each row, column and box.
+    """
+    return BacktrackingSearch(board, validValues, history, stats, searchMode, guessMode, state).run()
@@ -0,0 +1,216 @@
+"""
+Batched sudoku solver
+
+Date: 17/10/2026
+
+Solves many puzzles at once. Puzzles are loaded into an (N, 81) array and naked singles and lone rangers are
+applied to the whole batch with vectorized operations on candidate masks. Only the puzzles which propagation
+does not complete are handed to one of the scalar solver algorithms.
+"""
+import numpy as np
+import sudokuPuzzleUtils as spu
+import sudokuSolver as solver
+import sudokuIO as sio
+
+# Cell indices of each of the 27 units, and unit indices of each cell
+UNIT_INDEX = np.array([[row*9 + col for row, col in unit] for unit in spu.UNITS], dtype=np.intp)
+CELL_UNITS = np.array([spu.UNITS_OF[pos] for pos in spu.CELLS], dtype=np.intp)
+
+# Candidate bit of each digit and the digit of each single candidate mask
+DIGIT_BITS = np.array(spu.DIGIT_MASK, dtype=np.uint16)
+SINGLE_VALUE = np.array([values[0] if len(values) == 1 else 0 for values in spu.MASK_VALUES], dtype=np.uint8)
+
+def toArray(puzzles: list[str]) -> np.ndarray:
+    """
+    Converts 81 digit puzzle strings to an (N, 81) array.
+    Arguments:
+        puzzles: the puzzles in string format.
+    """
+    data = np.frombuffer("".join(puzzles).encode("ascii"), dtype=np.uint8)
+    return (data - ord("0")).reshape(-1, 81)
+
+def toStrings(grids: np.ndarray) -> list[str]:
+    """
+    Converts an (N, 81) array to 81 digit strings.
+    Arguments:
+        grids: the puzzles array.
+    """
+    data = (grids + ord("0")).astype(np.uint8).tobytes().decode("ascii")
+    return [data[i:i+81] for i in range(0, len(data), 81)]
+
+def getCandidates(grids: np.ndarray) -> np.ndarray:
+    """
+    Gets the candidate mask of every cell of every puzzle, zero for filled cells.
+    Arguments:
+        grids: the (N, 81) puzzles array.
+    """
+    bits = DIGIT_BITS[grids]
+    used = np.bitwise_or.reduce(bits[:, UNIT_INDEX], axis=2)
+    cellUsed = used[:, CELL_UNITS[:, 0]] | used[:, CELL_UNITS[:, 1]] | used[:, CELL_UNITS[:, 2]]
+
+    candidates = spu.ALL_DIGITS & ~cellUsed
+    candidates[grids != 0] = 0
+    return candidates
+
+def applyNakedSingles(grids: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """
+    Fills the cells which have a single candidate. Returns which puzzles changed.
+    Arguments:
+        grids: the (N, 81) puzzles array, updated in place.
+        candidates: the candidate masks of the puzzles.
+    """
+    values = SINGLE_VALUE[candidates]
+    found = values != 0
+    grids[found] = values[found]
+
+    return found.any(axis=1)
+
+def applyLoneRangers(grids: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """
+    Fills the cells which are the only place of a value in a row, column or box. Returns which puzzles changed.
+    Arguments:
+        grids: the (N, 81) puzzles array, updated in place.
+        candidates: the candidate masks of the puzzles.
+    """
+    # Values which are a candidate of exactly one cell of each unit
+    unitCandidates = candidates[:, UNIT_INDEX]
+    once = np.zeros(unitCandidates.shape[:2], dtype=np.uint16)
+    twice = np.zeros_like(once)
+    for i in range(0,9):
+        twice |= once & unitCandidates[:, :, i]
+        once |= unitCandidates[:, :, i]
+    single = once & ~twice
+
+    # Cells holding such a value in any of their units
+    values = SINGLE_VALUE[candidates & (single[:, CELL_UNITS[:, 0]] | single[:, CELL_UNITS[:, 1]] | single[:, CELL_UNITS[:, 2]])]
+    found = values != 0
+    grids[found] = values[found]
+
+    return found.any(axis=1)
+
+def propagate(grids: np.ndarray):
+    """
+    Applies naked singles and lone rangers to every puzzle until none of them changes.
+    Arguments:
+        grids: the (N, 81) puzzles array, updated in place.
+    """
+    active = np.arange(len(grids))
+
+    while len(active):
+        batch = grids[active]
+        candidates = getCandidates(batch)
+
+        # Both rules use the same candidates, deductions made from one state never contradict on a valid puzzle
+        changed = applyNakedSingles(batch, candidates) | applyLoneRangers(batch, candidates)
+
+        grids[active] = batch
+        active = active[changed]
+
+def isSolved(grids: np.ndarray) -> np.ndarray:
+    """
+    Checks which puzzles are completely and correctly filled.
+    Arguments:
+        grids: the (N, 81) puzzles array.
+    """
+    used = np.bitwise_or.reduce(DIGIT_BITS[grids][:, UNIT_INDEX], axis=2)
+    return (used == spu.ALL_DIGITS).all(axis=1) & (grids != 0).all(axis=1)
+
+def solveBatch(puzzles: list[str], alg: int, searchMode: int, guessMode: int, rules: list[str] | None = None) -> tuple[list[str], list[int]]:
+    """
+    Solves a batch of puzzles, propagating all of them at once and solving the rest one by one. Returns the
+    solutions in the order of the puzzles and the indices of the puzzles handed to the scalar solver. Anything
+    which is not an 81 digit puzzle, such as a blank line, gets a blank solution.
+    Arguments:
+        puzzles: the puzzles in string format.
+        alg: identifier for the algorithm solving puzzles not completed by propagation.
+        searchMode: defines how missing values are searched.
+        guessMode: defines how guesses are made.
+        rules: the rules applied by the rule-based algorithms besides singles, the algorithm default when None.
+    """
+    filled = [i for i, puzzle in enumerate(puzzles) if len(puzzle) == 81]
+    grids = toArray([puzzles[i] for i in filled])
+    propagate(grids)
+
+    solutions = [""] * len(puzzles)
+    for i, solution in zip(filled, toStrings(grids)):
+        solutions[i] = solution
+    remaining = [filled[i] for i in np.nonzero(~isSolved(grids))[0].tolist()]
+
+    scalar = solver.getSolver(alg, rules)
+    for i in remaining:
+        # A filled but invalid grid means the puzzle itself is inconsistent
+        puzzle = solutions[i] if "0" in solutions[i] else puzzles[i]
+        board = spu.to2DArray(puzzle)
+        scalar(board, spu.cacheValidValues(board), None, None, searchMode, guessMode)
+        solutions[i] = spu.toStr(board)
+
+    return solutions, remaining
+
+def solve(puzzlesFileName: str, solutionsFileName: str, batchSize: int, alg: int, searchMode: int, guessMode: int, rules: list[str] | None = None):
+    """
+    Solves puzzles found in a file in batches, writing the solution of each line on the same line.
+    Arguments:
+        puzzlesFileName: the file name containing puzzles, either one puzzle per line, id, puzzle, solution rows or packed puzzles.
+        solutionsFileName: the file name where to store the solutions.
+        batchSize: the number of puzzles propagated at once.
+        alg: identifier for the algorithm solving puzzles not completed by propagation.
+        searchMode: defines how missing values are searched.
+        guessMode: defines how guesses are made.
+        rules: the rules applied by the rule-based algorithms besides singles, the algorithm default when None.
+    """
+    import tqdm
+
+    total = 0
+    scalar = 0
+    with sio.openPuzzles(puzzlesFileName) as rows, sio.openStream(solutionsFileName, "w") as sf, \
+            tqdm.tqdm(total=sio.getPuzzleCount(puzzlesFileName)) as progress:
+        batch = list[str]()
+        for puzzle, reference in rows:
+            batch.append(puzzle)
+
+            if len(batch) < batchSize:
+                continue
+
+            solutions, remaining = solveBatch(batch, alg, searchMode, guessMode, rules)
+            sf.write("".join("{}\n".format(solution) for solution in solutions))
+            total += len(batch) - solutions.count("")
+            scalar += len(remaining)
+            progress.update(len(batch))
+            batch = list[str]()
+
+        if batch:
+            solutions, remaining = solveBatch(batch, alg, searchMode, guessMode, rules)
+            sf.write("".join("{}\n".format(solution) for solution in solutions))
+            total += len(batch) - solutions.count("")
+            scalar += len(remaining)
+            progress.update(len(batch))
+
+    print("Solved {:0.0f} puzzles, {:0.0f} completed by batched propagation.".format(total, total - scalar))
+
+def main():
+    import argparse
+    import rulebased as rbSolver
+
+    # Register arguments
+    parser = argparse.ArgumentParser();
+    parser.add_argument("puzzlesFileName", help="The file name of the sudoku puzzles dataset.", type=str)
+    parser.add_argument("solutionsFileName", help="The file name where to save the sudoku solutions.", type=str)
+    parser.add_argument("alg", help="The algorithm identifier for puzzles not completed by propagation.", type=int)
+    parser.add_argument("search", help="Defines how the puzzle is parsed, as for sudokuSolver.", type=int)
+    parser.add_argument("guess", help="defines how numbers are guessed: 1 sequentially; 2 randomly.", type=int)
+    parser.add_argument("--batch-size", help="The number of puzzles propagated at once.", type=int, default=4096)
+    parser.add_argument("--rules", help="Comma separated rules applied by the rule-based algorithms besides singles, or none: {}. By default none for rules and all for rules with propagation.".format(", ".join(rbSolver.RULES)), type=str, default=None)
+
+    args = parser.parse_args()
+
+    rules = None
+    if args.rules is not None:
+        rules = [rule.strip() for rule in args.rules.split(",") if rule.strip() and rule.strip() != "none"]
+        for rule in rules:
+            if rule not in rbSolver.RULES:
+                parser.error("Unrecognized rule: {}".format(rule))
+    solve(puzzlesFileName=args.puzzlesFileName, solutionsFileName=args.solutionsFileName, batchSize=args.batch_size, \
+        alg=args.alg, searchMode=args.search, guessMode=args.guess, rules=rules)
+
+if (__name__=="__main__"):
+    main()
@@ -0,0 +1,83 @@
+"""
+Solver benchmarking
+
+Date: 17/10/2026
+
+Times a solve function on a puzzle. Every run starts from fresh copies of the board and of the valid values, as
+the solvers fill both in place, and runs are timed with the monotonic nanosecond clock. The cost of taking the
+time around a call is measured once per process and subtracted from every run.
+"""
+import time
+
+# Nanoseconds spent timing a call that does nothing, measured on first use
+timerOverhead = None
+
+def noop(board, validValues, history, stats, searchMode, guessMode):
+    """
+    A solve function that does nothing, used to measure the timing overhead.
+    """
+    return True
+
+def getTimerOverhead(samples: int = 1000) -> int:
+    """
+    Gets the nanoseconds spent timing a call to a solve function, as the median of timing a function that
+    does nothing.
+    Arguments:
+        samples: the number of calls timed when measuring the overhead.
+    """
+    global timerOverhead
+
+    if timerOverhead is None:
+        clock = time.perf_counter_ns
+        times = list[int]()
+        for i in range(samples):
+            start = clock()
+            noop(None, None, None, None, 0, 0)
+            times.append(clock() - start)
+
+        timerOverhead = percentile(sorted(times), 50)
+
+    return timerOverhead
+
+def percentile(times: list[int], p: float) -> int:
+    """
+    Gets a percentile of sorted times by the nearest rank.
+    Arguments:
+        times: the times in ascending order.
+        p: the percentile from 0 to 100.
+    """
+    rank = -(-len(times) * p // 100)
+    return times[max(int(rank), 1) - 1]
+
+def timeSolver(solver, board: list[list[int]], validValues: dict[tuple[int, int], int], searchMode: int, guessMode: int, \
+               warmup: int = 1, repeat: int = 5) -> tuple[float, float, float]:
+    """
+    Times a solve function on a puzzle. Returns the minimum, median and 95th percentile time of a solve in seconds,
+    with the timing overhead subtracted. The board and valid values passed are left untouched.
+    Arguments:
+        solver: the solve function of the algorithm, as returned by sudokuSolver.getSolver.
+        board: the 9x9 puzzle to be solved.
+        validValues: the candidate mask for each unsolved cell.
+        searchMode: defines how missing values are searched.
+        guessMode: defines how guesses are made.
+        warmup: the number of untimed runs before timing.
+        repeat: the number of timed runs.
+    """
+    clock = time.perf_counter_ns
+    overhead = getTimerOverhead()
+
+    times = list[int]()
+    for i in range(warmup + max(repeat, 1)):
+        # Every run solves the original puzzle
+        runBoard = [row[:] for row in board]
+        runValues = dict(validValues)
+
+        start = clock()
+        solver(runBoard, runValues, None, None, searchMode, guessMode)
+        elapsed = clock() - start
+
+        if i >= warmup:
+            times.append(max(elapsed - overhead, 0))
+
+    times.sort()
+    return times[0] / 1e9, percentile(times, 50) / 1e9, percentile(times, 95) / 1e9
@@ -0,0 +1,361 @@
+"""
+Benchmark report
+
+Date: 17/10/2026
+
+Summarizes the execution time, guesses and backtracks of prototype evaluations by algorithm, search mode, guess mode and
+number of zeros, with confidence intervals of the mean and median and upper percentiles. A run is compared with a
+baseline run cell by cell: each difference is tested with a two-sided Mann-Whitney U test, which makes no
+assumption on the shape of the distributions, and the p-values are adjusted with the Holm method so the chance of
+any false alarm stays within the significance level. A cell is flagged only when its change is also larger than a
+minimum relative effect.
+
+Execution times are only comparable when measured the same way. Each evaluation records the warmup, repeat and
+statistic of its timings in a run manifest of its output directory; execution times of cells whose timing settings
+differ from the baseline, or are unknown as for runs older than the manifest, are reported as incomparable and only
+their guesses and backtracks are compared. Timings of runs made on different machines are not comparable either,
+which the manifest cannot tell.
+"""
+import json
+import math
+import statistics
+import numpy as np
+import pandas as pd
+
+# Columns identifying a cell of the report, the metrics reported of each, and the column of the timing settings of a row
+CELL_COLUMNS = ["algorithm", "search", "guess", "Zeros"]
+METRICS = ["Execution Time", "Guesses", "Backtracks"]
+TIMING_COLUMN = "timing"
+
+# Run manifest of an output directory, holding the timing settings of each stats file
+MANIFEST_FILE_NAME = "run_manifest.json"
+
+# Percentiles reported of each metric
+PERCENTILES = [50, 90, 95, 99]
+
+# Verdicts of a cell and of a run
+VERDICT_REGRESSION = "regression"
+VERDICT_IMPROVEMENT = "improvement"
+VERDICT_UNCHANGED = "unchanged"
+VERDICT_INSUFFICIENT = "insufficient"
+VERDICT_INCOMPARABLE = "incomparable"
+
+def getTimingKey(warmup: int, repeat: int) -> str:
+    """
+    Gets the timing settings of a run as a key, which is equal for runs whose execution times are measured the same way.
+    Arguments:
+        warmup: the number of untimed runs of each puzzle before timing.
+        repeat: the number of timed runs of each puzzle.
+    """
+    return json.dumps({"warmup": warmup, "repeat": repeat, "statistic": "median", "overheadCorrected": True}, sort_keys=True)
+
+def readManifest(directory: str) -> dict[str, str]:
+    """
+    Reads the timing key of each stats file of an output directory, empty when the directory has no manifest.
+    Arguments:
+        directory: the output directory of a prototype evaluation.
+    """
+    import os
+
+    fileName = os.path.join(directory, MANIFEST_FILE_NAME)
+    if not os.path.exists(fileName):
+        return dict[str, str]()
+
+    with open(fileName, "r", encoding="utf-8") as f:
+        return json.load(f).get("timing", dict[str, str]())
+
+def updateManifest(directory: str, statsFileNames: list[str], timingKey: str):
+    """
+    Records the timing settings of stats files in the manifest of an output directory, keeping the other entries.
+    Arguments:
+        directory: the output directory of a prototype evaluation.
+        statsFileNames: the stats files written with the timing settings.
+        timingKey: the timing settings, as returned by getTimingKey.
+    """
+    import os
+
+    timing = readManifest(directory)
+    for statsFileName in statsFileNames:
+        timing[os.path.basename(statsFileName)] = timingKey
+
+    fileName = os.path.join(directory, MANIFEST_FILE_NAME)
+    with open(fileName + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"timing": timing}, f, indent=2)
+    os.replace(fileName + ".tmp", fileName)
+
+def readResults(directory: str) -> pd.DataFrame:
+    """
+    Reads the stats files of every configuration in an output directory, with the timing key of each file from the
+    run manifest, None when unknown. Rows which are not complete are dropped, and algorithm names are matched to the
+    current names regardless of case.
+    Arguments:
+        directory: the output directory of a prototype evaluation.
+    """
+    import os
+    import re
+    import sudokuSolver as solver
+
+    names = {solver.getAlg(a).lower(): solver.getAlg(a) for a in range(1,6)}
+    pattern = re.compile(r"^(.+)_search_(\d+)_guess_(\d+)\.csv$")
+
+    timing = readManifest(directory)
+    parts = list[pd.DataFrame]()
+    for fileName in sorted(os.listdir(directory)):
+        match = pattern.match(fileName)
+        if match is None:
+            continue
+
+        data = pd.read_csv(os.path.join(directory, fileName), dtype={"Puzzle": str, "Solution": str})
+        data = data.dropna(subset=["Zeros"] + METRICS)
+        data["algorithm"] = names.get(match.group(1).lower(), match.group(1))
+        data["search"] = int(match.group(2))
+        data["guess"] = int(match.group(3))
+        data[TIMING_COLUMN] = timing.get(fileName)
+        parts.append(data[CELL_COLUMNS + METRICS + [TIMING_COLUMN]])
+
+    if not parts:
+        raise ValueError("{} has no stats files of configurations\n".format(directory))
+
+    results = pd.concat(parts, ignore_index=True)
+    results["Zeros"] = results["Zeros"].astype(int)
+    return results
+
+def getMedianInterval(values: np.ndarray, confidence: float) -> tuple[float, float]:
+    """
+    Gets the confidence interval of the median of sorted values from their order statistics.
+    Arguments:
+        values: the values in ascending order.
+        confidence: the confidence level of the interval.
+    """
+    n = len(values)
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    low = int(math.floor(n / 2 - z * math.sqrt(n) / 2))
+    high = int(math.ceil(n / 2 + z * math.sqrt(n) / 2))
+    return values[max(low, 0)], values[min(high, n - 1)]
+
+def summarize(results: pd.DataFrame, confidence: float = 0.95) -> pd.DataFrame:
+    """
+    Summarizes every metric of every cell: the number of puzzles, the mean with its confidence interval, the standard
+    deviation, the median with its confidence interval and the upper percentiles.
+    Arguments:
+        results: the results of a run, with the cell and metric columns.
+        confidence: the confidence level of the intervals.
+    """
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    rows = list[dict]()
+    for cell, data in results.groupby(by=CELL_COLUMNS):
+        row = dict(zip(CELL_COLUMNS, cell))
+        row["count"] = len(data)
+
+        for metric in METRICS:
+            values = np.sort(data[metric].to_numpy(dtype=float))
+            mean = values.mean()
+            std = values.std(ddof=1) if len(values) > 1 else 0.0
+            margin = z * std / math.sqrt(len(values))
+            medianLow, medianHigh = getMedianInterval(values, confidence)
+
+            row.update({"{} Mean".format(metric): mean, "{} Mean Low".format(metric): mean - margin, "{} Mean High".format(metric): mean + margin, \
+                        "{} Std".format(metric): std, "{} Median Low".format(metric): medianLow, "{} Median High".format(metric): medianHigh})
+            for p in PERCENTILES:
+                row["{} P{:0.0f}".format(metric, p)] = np.percentile(values, p)
+
+        rows.append(row)
+
+    return pd.DataFrame(rows)
+
+def mannWhitney(current: np.ndarray, baseline: np.ndarray) -> tuple[float, float]:
+    """
+    Tests whether two samples come from the same distribution, with the normal approximation of the Mann-Whitney U
+    statistic corrected for ties. Returns the z score, positive when current values tend to be larger, and the
+    two-sided p-value.
+    Arguments:
+        current: the values of the current run.
+        baseline: the values of the baseline run.
+    """
+    n1 = len(current)
+    n2 = len(baseline)
+    n = n1 + n2
+    values = np.concatenate((current, baseline))
+
+    ranks = pd.Series(values).rank().to_numpy()
+    u = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+
+    ties = np.unique(values, return_counts=True)[1].astype(float)
+    variance = n1 * n2 / 12 * ((n + 1) - (ties**3 - ties).sum() / (n * (n - 1)))
+    if variance <= 0:
+        return 0.0, 1.0
+
+    # Continuity correction towards the mean of U
+    difference = u - n1 * n2 / 2
+    z = (difference - math.copysign(0.5, difference)) / math.sqrt(variance) if difference != 0 else 0.0
+    return z, math.erfc(abs(z) / math.sqrt(2))
+
+def adjustHolm(pValues: np.ndarray) -> np.ndarray:
+    """
+    Adjusts p-values of a family of tests with the Holm step-down method.
+    Arguments:
+        pValues: the p-values of the tests.
+    """
+    m = len(pValues)
+    order = np.argsort(pValues)
+    adjusted = np.minimum(np.maximum.accumulate(pValues[order] * (m - np.arange(m))), 1.0)
+
+    result = np.empty(m)
+    result[order] = adjusted
+    return result
+
+def compare(current: pd.DataFrame, baseline: pd.DataFrame, alpha: float = 0.05, minEffect: float = 0.05, minSamples: int = 10) -> pd.DataFrame:
+    """
+    Compares every metric of the cells found in both runs. Returns a row per cell and metric with the means and
+    medians of both runs, the relative change of the mean, the test statistics and the verdict of the cell. Execution
+    times are only tested when both runs timed the cell with the same known settings, otherwise they are incomparable.
+    Arguments:
+        current: the results of the current run.
+        baseline: the results of the baseline run.
+        alpha: the significance level of the whole family of tests.
+        minEffect: the smallest relative change of the mean which is flagged.
+        minSamples: the fewest puzzles of a cell in each run for it to be tested.
+    """
+    baselineCells = dict(iter(baseline.groupby(by=CELL_COLUMNS)))
+
+    def getTiming(data: pd.DataFrame) -> str | None:
+        # The single timing key of the rows of a cell, None when unknown or mixed
+        if TIMING_COLUMN not in data:
+            return None
+        keys = data[TIMING_COLUMN].unique()
+        return keys[0] if len(keys) == 1 and isinstance(keys[0], str) else None
+
+    rows = list[dict]()
+    for cell, data in current.groupby(by=CELL_COLUMNS):
+        if cell not in baselineCells:
+            continue
+
+        timing = getTiming(data)
+        comparable = timing is not None and timing == getTiming(baselineCells[cell])
+
+        for metric in METRICS:
+            values = data[metric].to_numpy(dtype=float)
+            baselineValues = baselineCells[cell][metric].to_numpy(dtype=float)
+
+            row = dict(zip(CELL_COLUMNS, cell))
+            row.update({"metric": metric, "count": len(values), "baseline count": len(baselineValues), \
+                        "mean": values.mean(), "baseline mean": baselineValues.mean(), \
+                        "median": np.median(values), "baseline median": np.median(baselineValues)})
+
+            if row["baseline mean"] != 0:
+                row["change"] = (row["mean"] - row["baseline mean"]) / row["baseline mean"]
+            else: row["change"] = 0.0 if row["mean"] == 0 else math.inf
+
+            row["incomparable"] = metric == "Execution Time" and not comparable
+            if not row["incomparable"] and len(values) >= minSamples and len(baselineValues) >= minSamples:
+                row["z"], row["p"] = mannWhitney(values, baselineValues)
+            else: row["z"], row["p"] = math.nan, math.nan
+
+            rows.append(row)
+
+    comparison = pd.DataFrame(rows)
+    if comparison.empty:
+        return comparison
+
+    # Adjust the p-values of the cells tested, then flag significant changes at least as large as the minimum effect
+    tested = comparison["p"].notna()
+    comparison["adjusted p"] = math.nan
+    comparison.loc[tested, "adjusted p"] = adjustHolm(comparison.loc[tested, "p"].to_numpy())
+
+    significant = comparison["adjusted p"] < alpha
+    comparison["verdict"] = VERDICT_UNCHANGED
+    comparison.loc[~tested, "verdict"] = VERDICT_INSUFFICIENT
+    comparison.loc[comparison["incomparable"], "verdict"] = VERDICT_INCOMPARABLE
+    comparison.loc[significant & (comparison["z"] > 0) & (comparison["change"] >= minEffect), "verdict"] = VERDICT_REGRESSION
+    comparison.loc[significant & (comparison["z"] < 0) & (comparison["change"] <= -minEffect), "verdict"] = VERDICT_IMPROVEMENT
+
+    return comparison
+
+def getVerdict(comparison: pd.DataFrame, alpha: float, minEffect: float) -> dict:
+    """
+    Gets the verdict of a run from the comparison of its cells: a regression if any cell regressed, an improvement
+    if any cell improved and none regressed, otherwise unchanged.
+    Arguments:
+        comparison: the comparison of the cells, as returned by compare.
+        alpha: the significance level used.
+        minEffect: the minimum relative effect used.
+    """
+    def getCells(verdict: str) -> list[dict]:
+        cells = comparison[comparison["verdict"] == verdict] if not comparison.empty else comparison
+        return [{"algorithm": row["algorithm"], "search": int(row["search"]), "guess": int(row["guess"]), "zeros": int(row["Zeros"]), \
+                 "metric": row["metric"], "change": float(row["change"]), "adjustedP": float(row["adjusted p"])} for i, row in cells.iterrows()]
+
+    regressions = getCells(VERDICT_REGRESSION)
+    improvements = getCells(VERDICT_IMPROVEMENT)
+
+    if regressions:
+        verdict = VERDICT_REGRESSION
+    elif improvements:
+        verdict = VERDICT_IMPROVEMENT
+    else: verdict = VERDICT_UNCHANGED
+
+    return {"verdict": verdict, "alpha": alpha, "minEffect": minEffect, "compared": len(comparison), \
+            "insufficient": int((comparison["verdict"] == VERDICT_INSUFFICIENT).sum()) if not comparison.empty else 0, \
+            "incomparable": int((comparison["verdict"] == VERDICT_INCOMPARABLE).sum()) if not comparison.empty else 0, \
+            "regressions": regressions, "improvements": improvements}
+
+def report(results: pd.DataFrame, outputDir: str, baseline: pd.DataFrame | None = None, confidence: float = 0.95, alpha: float = 0.05, \
+           minEffect: float = 0.05, minSamples: int = 10) -> dict | None:
+    """
+    Writes the summary of a run to benchmark_report.csv and, when a baseline is given, its comparison with the baseline
+    to benchmark_comparison.csv and the verdict to benchmark_verdict.json. Returns the verdict, None without a baseline.
+    Arguments:
+        results: the results of the run, with the cell and metric columns.
+        outputDir: the directory where to store the report.
+        baseline: the results of the baseline run, if any.
+        confidence: the confidence level of the intervals of the summary.
+        alpha: the significance level of the comparison.
+        minEffect: the smallest relative change of the mean which is flagged.
+        minSamples: the fewest puzzles of a cell in each run for it to be compared.
+    """
+    summarize(results, confidence).to_csv("{}/benchmark_report.csv".format(outputDir), index=False)
+
+    if baseline is None:
+        return None
+
+    comparison = compare(results, baseline, alpha, minEffect, minSamples)
+    comparison.to_csv("{}/benchmark_comparison.csv".format(outputDir), index=False)
+
+    verdict = getVerdict(comparison, alpha, minEffect)
+    with open("{}/benchmark_verdict.json".format(outputDir), "w", encoding="utf-8") as f:
+        json.dump(verdict, f, indent=2)
+
+    return verdict
+
+def main():
+    import sys
+    import argparse
+
+    # Register arguments
+    parser = argparse.ArgumentParser();
+    parser.add_argument("outputDir", help="The output directory of the prototype evaluation to report on.", type=str)
+    parser.add_argument("--baseline", help="The output directory of the baseline prototype evaluation to compare with.", type=str, default=None)
+    parser.add_argument("--confidence", help="The confidence level of the intervals.", type=float, default=0.95)
+    parser.add_argument("--alpha", help="The significance level of the comparison with the baseline.", type=float, default=0.05)
+    parser.add_argument("--min-effect", help="The smallest relative change of a mean which is flagged.", type=float, default=0.05)
+    parser.add_argument("--min-samples", help="The fewest puzzles of a cell in each run for it to be compared.", type=int, default=10)
+    args = parser.parse_args()
+
+    if not 0 < args.confidence < 1 or not 0 < args.alpha < 1:
+        parser.error("The confidence and alpha must be between 0 and 1")
+    if args.min_effect < 0 or args.min_samples < 2:
+        parser.error("The minimum effect must not be negative and the minimum samples must be at least 2")
+
+    baseline = readResults(args.baseline) if args.baseline is not None else None
+    verdict = report(readResults(args.outputDir), args.outputDir, baseline, args.confidence, args.alpha, args.min_effect, args.min_samples)
+
+    # Fail on a regression, so solver changes can be gated on the report
+    if verdict is not None:
+        print("Verdict: {}, {:0.0f} regressions and {:0.0f} improvements in {:0.0f} comparisons.".format(verdict["verdict"], \
+            len(verdict["regressions"]), len(verdict["improvements"]), verdict["compared"]))
+        if verdict["verdict"] == VERDICT_REGRESSION:
+            sys.exit(1)
+
+if (__name__=="__main__"):
+    main()
@@ -0,0 +1,246 @@
+"""
+Sudoku solver algorithm
+
+Date: 17/10/2026
+
+Implementation of Knuth's Algorithm X with dancing links. A puzzle is modelled as an exact cover problem with
+324 constraints (columns): every cell holds one value, and every row, column and box holds each value once. Each
+candidate value of a cell is a row of the matrix covering four columns. Only the columns not yet satisfied by
+the filled cells and the rows of candidate values are linked, so the matrix shrinks with the number of clues.
+"""
+import sudokuPuzzleUtils as spu
+
+def getColumns(pos: tuple[int, int], val: int) -> tuple[int, int, int, int]:
+    """
+    Gets the four constraint columns covered by placing a value in a cell.
+    Arguments:
+        pos: the row and column position.
+        val: the value placed.
+    """
+    row, col = pos
+    return (row*9 + col, 81 + row*9 + val - 1, 162 + col*9 + val - 1, 243 + spu.getBox(pos)*9 + val - 1)
+
+class DancingLinks:
+    """
+    The sparse exact cover matrix of a puzzle, stored as parallel lists of left, right, up and down links.
+    Node 0 is the root, followed by one header node per constraint column and then the nodes of each row.
+    """
+    def __init__(self, board: list[list[int]], validValues: dict[tuple[int, int], int]):
+        state = spu.BoardState(board)
+
+        # Candidate values of each empty cell
+        candidates = list[tuple[tuple[int, int], int]]()
+        for row in range(0,9):
+            for col in range(0,9):
+                if board[row][col]==0:
+                    pos = (row, col)
+                    candidates.append((pos, validValues.get(pos, 0) & ~state.getUsed(pos)))
+
+        # Constraints still to satisfy are the empty cells and the values missing in each row, column and box
+        columns = [pos[0]*9 + pos[1] for pos, _ in candidates]
+        for unit, offset in ((state.rows, 81), (state.cols, 162), (state.boxes, 243)):
+            for i in range(0,9):
+                for val in spu.MASK_VALUES[spu.ALL_DIGITS & ~unit[i]]:
+                    columns.append(offset + i*9 + val - 1)
+
+        # Link the root and the column headers in a circular list
+        count = len(columns)
+        self.L = [count] + list(range(0, count))
+        self.R = list(range(1, count + 1)) + [0]
+        self.U = list(range(0, count + 1))
+        self.D = list(range(0, count + 1))
+        self.C = list(range(0, count + 1))
+        self.S = [0] * (count + 1)
+        self.rows = [None] * (count + 1)
+
+        header = dict[int, int]()
+        for i, column in enumerate(columns):
+            header[column] = i + 1
+
+        # Add a row of four nodes for each candidate value
+        for pos, mask in candidates:
+            for val in spu.MASK_VALUES[mask]:
+                first = len(self.C)
+                for column in getColumns(pos, val):
+                    self.addNode(header[column], first, (pos, val))
+
+    def addNode(self, c: int, first: int, row: tuple[tuple[int, int], int]):
+        """
+        Appends a node at the bottom of a column and at the end of its row.
+        Arguments:
+            c: the column header node.
+            first: the first node of the row.
+            row: the cell position and value the row represents.
+        """
+        node = len(self.C)
+        self.C.append(c)
+        self.rows.append(row)
+
+        # Vertical links
+        self.U.append(self.U[c])
+        self.D.append(c)
+        self.D[self.U[c]] = node
+        self.U[c] = node
+        self.S[c] += 1
+
+        # Horizontal links
+        if node == first:
+            self.L.append(node)
+            self.R.append(node)
+        else:
+            self.L.append(self.L[first])
+            self.R.append(first)
+            self.R[self.L[first]] = node
+            self.L[first] = node
+
+    def cover(self, c: int):
+        """
+        Removes a column and all rows intersecting it from the matrix.
+        Arguments:
+            c: the column header node.
+        """
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        R[L[c]] = R[c]
+        L[R[c]] = L[c]
+
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                D[U[j]] = D[j]
+                U[D[j]] = U[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def uncover(self, c: int):
+        """
+        Restores a column and all rows intersecting it, in reverse order of cover.
+        Arguments:
+            c: the column header node.
+        """
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                D[U[j]] = j
+                U[D[j]] = j
+                j = L[j]
+            i = U[i]
+
+        R[L[c]] = c
+        L[R[c]] = c
+
+    def chooseColumn(self) -> int:
+        """
+        Chooses the column with the fewest rows, returning the root when all columns are covered.
+        """
+        R, S = self.R, self.S
+        best = 0
+        size = None
+
+        c = R[0]
+        while c != 0:
+            if size is None or S[c] < size:
+                best = c
+                size = S[c]
+                if size <= 1:
+                    break
+            c = R[c]
+
+        return best
+
+    def search(self, board: list[list[int]], history: list | None, stats: spu.SudokuStats | None, guessMode: int) -> bool:
+        """
+        Searches for an exact cover, writing the chosen values in the board.
+        Arguments:
+            board: the 9x9 puzzle to be solved.
+            history: a list containing a history of solutions for tracking.
+            stats: The statistics object to record algorithm.
+            guessMode: the mode how the rows of a column are tried, 1 sequentially and 2 randomly.
+        """
+        c = self.chooseColumn()
+
+        if __debug__ and stats is not None:
+            stats.findEmptyScans += 1
+
+        # All constraints are satisfied
+        if c == 0:
+            return True
+
+        # A constraint cannot be satisfied
+        if self.S[c] == 0:
+            return False
+
+        R, L, D = self.R, self.L, self.D
+        self.cover(c)
+
+        nodes = list[int]()
+        r = D[c]
+        while r != c:
+            nodes.append(r)
+            r = D[r]
+
+        if guessMode==2:
+            import random
+            random.shuffle(nodes)
+
+        for r in nodes:
+            (row, col), val = self.rows[r]
+
+            # Choose the value
+            if stats is not None:
+                stats.incrementGuesses()
+                if __debug__:
+                    stats.registerBranch()
+
+            board[row][col] = val
+
+            if history is not None:
+                history.append(spu.toStr(board))
+
+            j = R[r]
+            while j != r:
+                self.cover(self.C[j])
+                j = R[j]
+
+            if __debug__ and stats is not None:
+                stats.descend()
+            solved = self.search(board, history, stats, guessMode)
+            if __debug__ and stats is not None:
+                stats.ascend()
+            if solved:
+                return True
+
+            # Undo the choice
+            j = L[r]
+            while j != r:
+                self.uncover(self.C[j])
+                j = L[j]
+
+            if history is not None:
+                history.remove(spu.toStr(board))
+
+            if stats is not None:
+                stats.incrementBacktracks()
+
+            board[row][col] = 0
+
+        self.uncover(c)
+        return False
+
+def solve(board: list[list[int]], validValues: dict[tuple[int, int], int], history: list | None, stats: spu.SudokuStats | None, searchMode: int, guessMode: int) -> bool:
+    """
+    Solves a 9x9 sudoku puzzle using dancing links. Columns are always chosen by fewest remaining rows, so
+    the search mode does not apply.
+    Arguments:
+        board: the 9x9 puzzle to be solved.
+        validValues: the candidate mask for each unsolved cell.
+        history: a list containing a history of solutions for tracking.
+        stats: The statistics object to record algorithm.
+        searchMode: the mode how the next empty cell is found, unused.
+        guessMode: the mode how the next number is guessed.
+    """
+    return DancingLinks(board, validValues).search(board, history, stats, guessMode)
@@ -5,14 +5,14 @@ Author: Frankie Inguanez
 Date: 26/01/2023
 """
 import tqdm
-import sudokuPuzzleUtils as spu
+import sudokuIO as sio
 from matplotlib import pyplot as plt
 
 def eval(puzzlesFileName: str, zerosFileName:str, difficultyFileName:str):
     """
     Evaluates a dataset, by generating histograms for number of zeros and difficulty level.
     Arguments:
-        puzzlesFileName: the file name where the puzzles are located.
+        puzzlesFileName: the file name where the puzzles are located, either one puzzle per line, id, puzzle, solution rows or packed puzzles.
         zerosFileName: the file name where to save the histogram for number of zeros.
         difficultyFileName: the file name where to save the histogram for difficulty levels.
     """
@@ -22,10 +22,10 @@ def eval(puzzlesFileName: str, zerosFileName:str, difficultyFileName:str):
         zeros[i] = 0
 
     # Read the puzzles file
-    with open(puzzlesFileName, "r", encoding="utf-8") as pf:
-        for line in tqdm.tqdm(pf, total=spu.getFileLineCount(puzzlesFileName)):
+    with sio.openPuzzles(puzzlesFileName) as rows:
+        for puzzle, solution in tqdm.tqdm(rows, total=sio.getPuzzleCount(puzzlesFileName)):
             # Count the number of zeros
-            zeroCount = line.count('0')
+            zeroCount = puzzle.count('0')
             zeros[zeroCount] += 1     
 
     # Reduce dictionary to include only non zero keys
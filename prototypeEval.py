@@ -8,70 +8,594 @@ Date: 26/01/2023
 import pandas as pd
 import sudokuPuzzleUtils as spu
 import sudokuSolver as solver
+import sudokuIO as sio
 
-def evaluate(puzzlesFileName: str, outputDir: str, offset: int, limit: int):
+# Columns of the stats file of a configuration, and of the results of a sweep over configurations
+STATS_COLUMNS = ["Puzzle", "Solution", "Execution Time", "Zeros", "Guesses", "Backtracks", "Execution Time Min", "Execution Time P95"]
+RESULT_COLUMNS = ["algorithm", "search", "guess"] + STATS_COLUMNS
+
+def getConfigurations(algs: list[int] | None = None, searchModes: list[int] | None = None, guessModes: list[int] | None = None) \
+        -> list[tuple[int, int, int]]:
+    """
+    Gets the algorithm, search mode and guess mode of every configuration to evaluate. Algorithms which ignore
+    the search mode are evaluated with a single search mode.
+    Arguments:
+        algs: the algorithm identifiers, all when None.
+        searchModes: the search modes, all when None.
+        guessModes: the guess modes, all when None.
+    """
+    algs = algs or list(range(1,6))
+    searchModes = searchModes or list(range(1,13))
+    guessModes = guessModes or list(range(1,3))
+
+    # Search modes of each algorithm, the first requested one when it supports none of them
+    algSearchModes = dict[int, list[int]]()
+    for a in algs:
+        supported = solver.getSearchModes(a)
+        algSearchModes[a] = [s for s in searchModes if s in supported] or searchModes[:1]
+
+    return [(a, s, g) for s in searchModes for g in guessModes for a in algs if s in algSearchModes[a]]
+
+def getStatsFileName(outputDir: str, alg: int, searchMode: int, guessMode: int) -> str:
+    """
+    Gets the file name of the stats of a configuration.
+    Arguments:
+        outputDir: the directory where to store all output.
+        alg: the algorithm identifier.
+        searchMode: the search mode.
+        guessMode: the guess mode.
+    """
+    return "{}/{}_search_{:0.0f}_guess_{:0.0f}.csv".format(outputDir, solver.getAlg(alg), searchMode, guessMode)
+
+def readStats(statsFileName: str, alg: int, searchMode: int, guessMode: int) -> pd.DataFrame:
     """
-    Evaluates all implemented algorithms and variations, for a limit number of puzzles.
+    Reads the stats file of a configuration as a frame of RESULT_COLUMNS.
+    Arguments:
+        statsFileName: the file name of the stats.
+        alg: the algorithm identifier.
+        searchMode: the search mode.
+        guessMode: the guess mode.
+    """
+    data = pd.read_csv(statsFileName, dtype={"Puzzle": str, "Solution": str})
+    data.insert(0, "algorithm", solver.getAlg(alg))
+    data.insert(1, "search", searchMode)
+    data.insert(2, "guess", guessMode)
+    return data[RESULT_COLUMNS]
+
+def getPuzzleRange(puzzlesFileName: str, offset: int, limit: int) -> tuple[int, int]:
+    """
+    Gets the offset and limit of the puzzles to consider, within the puzzles of the file.
+    Arguments:
+        puzzlesFileName: the file name of the puzzles.
+        offset: the number of puzzles to offset.
+        limit: the limit number of puzzles to consider, all after the offset when 0 or None.
+    """
+    puzzleCount = sio.getPuzzleCount(puzzlesFileName)
+    offset = min(max(offset or 0, 0), puzzleCount)
+    if not limit:
+        limit = puzzleCount - offset
+    else: limit = min(limit, puzzleCount - offset)
+
+    return offset, limit
+
+# Modules whose code decides the results of each algorithm, besides the modules shared by all algorithms
+SHARED_MODULES = ["sudokuPuzzleUtils", "sudokuSolver", "benchmark"]
+SOLVER_MODULES = {1: ["backtracking"], 2: ["rulebased", "backtracking"], 3: ["backtracking"], 4: ["dancinglinks"], 5: ["rulebased", "backtracking"]}
+
+def hashModules(names: list[str]) -> str:
+    """
+    Gets the hash of the source code of a number of modules.
+    Arguments:
+        names: the module names.
+    """
+    import hashlib
+    import inspect
+    import importlib
+
+    digest = hashlib.sha256()
+    for name in names:
+        with open(inspect.getsourcefile(importlib.import_module(name)), "rb") as f:
+            digest.update(f.read())
+
+    return digest.hexdigest()
+
+def hashPuzzles(puzzlesFileName: str, offset: int, limit: int) -> str:
+    """
+    Gets the hash of a range of puzzles, the same for the same puzzles in any file format.
+    Arguments:
+        puzzlesFileName: the file name of the puzzles.
+        offset: the number of puzzles to offset.
+        limit: the number of puzzles to consider.
+    """
+    import hashlib
+
+    digest = hashlib.sha256()
+    with sio.openPuzzles(puzzlesFileName, offset, offset + limit) as rows:
+        for puzzle, reference in rows:
+            digest.update(puzzle.encode("ascii") + b"\n")
+
+    return digest.hexdigest()
+
+def getCacheKey(puzzlesHash: str, modulesHash: str, alg: int, searchMode: int, guessMode: int, warmup: int, repeat: int) -> str:
+    """
+    Gets the key of the cached results of a configuration, which changes with the puzzles, the solver code or the
+    settings of the configuration.
+    Arguments:
+        puzzlesHash: the hash of the puzzles, as returned by hashPuzzles.
+        modulesHash: the hash of the modules of the algorithm, as returned by hashModules.
+        alg: the algorithm identifier.
+        searchMode: the search mode.
+        guessMode: the guess mode.
+        warmup: the number of untimed runs of each puzzle before timing.
+        repeat: the number of timed runs of each puzzle.
+    """
+    import json
+    import hashlib
+
+    key = {"puzzles": puzzlesHash, "modules": modulesHash, "alg": alg, "searchMode": searchMode, "guessMode": guessMode, \
+           "warmup": warmup, "repeat": repeat}
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+def sweepChunk(task: tuple[list[int], list[str], list[tuple[int, int, int]], int, int]) \
+        -> tuple[pd.DataFrame, list[list[str]], list[tuple[str, Exception]]]:
+    """
+    Solves a chunk of puzzles with a block of configurations, parsing each puzzle once for all of them. Returns
+    the results as a frame of RESULT_COLUMNS, the stats records of each configuration of the block and the errors
+    raised with what was being solved.
+    Arguments:
+        task: the number of each puzzle, the puzzles, the configurations, and the warmup and repeat of the timing.
+    """
+    numbers, puzzles, configurations, warmup, repeat = task
+    solvers = [solver.getSolver(a) for a, s, g in configurations]
+    results = {column: list() for column in RESULT_COLUMNS}
+    records = [list[str]() for configuration in configurations]
+    errors = list[tuple[str, Exception]]()
+
+    for number, puzzle in zip(numbers, puzzles):
+        # Parse the puzzle once for all configurations, each of which solves its own copy
+        try:
+            board = spu.to2DArray(puzzle)
+            validValues = spu.cacheValidValues(board)
+            unknowns = puzzle.count('0')
+        except Exception as e:
+            errors.append(("puzzle {} ({})".format(number, puzzle), e))
+            continue
+
+        for (a, s, g), solve, configurationRecords in zip(configurations, solvers, records):
+            try:
+                solution, history, stats = solver.solveBoard([row[:] for row in board], dict(validValues), unknowns, solve, s, g, False, warmup, repeat)
+            except Exception as e:
+                errors.append(("puzzle {} ({}) with {} search {} guess {}".format(number, puzzle, solver.getAlg(a), s, g), e))
+                continue
+
+            record = (solver.getAlg(a), s, g, puzzle, solution, stats.executionTime, stats.unknowns, stats.guesses, stats.backtracks, \
+                      stats.executionTimeMin, stats.executionTimeP95)
+            for column, value in zip(RESULT_COLUMNS, record):
+                results[column].append(value)
+
+            configurationRecords.append("{},{},{:0.17f},{:0.0f},{:0.0f},{:0.0f},{:0.17f},{:0.17f}".format(*record[3:]))
+
+    return pd.DataFrame(results, columns=RESULT_COLUMNS), records, errors
+
+def sweepKeyedChunk(task: tuple[tuple[int, int], tuple]) -> tuple[tuple[int, int], tuple]:
+    """
+    Solves a task of sweepChunk which carries its chunk and block numbers. Returns the numbers with the results.
+    Arguments:
+        task: the chunk and block numbers, and the task of sweepChunk.
+    """
+    key, chunkTask = task
+    return key, sweepChunk(chunkTask)
+
+def sweep(puzzlesFileName: str, outputDir: str, configurations: list[tuple[int, int, int]], offset: int, limit: int, \
+          warmup: int = 1, repeat: int = 5, workers: int = 1, chunkSize: int = 16, checkpointInterval: int = 100, \
+          resume: bool = False) -> pd.DataFrame:
+    """
+    Solves puzzles with a number of configurations, reading and parsing each puzzle once. Puzzles are split in
+    chunks and configurations in up to one block per worker, and every chunk is solved with every block by a pool
+    of processes, with several chunks in flight. Results are merged in chunk and block order, so stats files keep
+    the order of the puzzles, and returned as a frame of RESULT_COLUMNS, concatenated once at the end. The stats
+    of each configuration are also written to its file in the output directory, and the progress is checkpointed
+    after whole chunks so that an interrupted sweep can be resumed.
     Arguments:
         puzzlesFileName: the file name of the puzzles.
         outputDir: the directory where to store all output.
+        configurations: the algorithm, search mode and guess mode of each configuration.
         offset: the number of puzzles to offset.
         limit: the limit number of puzzles to consider.
+        warmup: the number of untimed runs of each puzzle before timing.
+        repeat: the number of timed runs of each puzzle.
+        workers: the number of processes solving puzzles, 1 to solve them in the current process.
+        chunkSize: the number of puzzles of each task.
+        checkpointInterval: the number of puzzles swept between checkpoints.
+        resume: whether to continue from the checkpoint of a previous sweep with the same settings.
     """
-    # Solve with all possible combinations and save statistics
-    for s in range(1,10):
-        for g in range(1,3):
-            for a in range(1,3):
-                solver.solve(puzzlesFileName=puzzlesFileName, solutionsFileName=str(None), statsFileName="{}/{}_search_{:0.0f}_guess_{:0.0f}.csv".format(outputDir, solver.getAlg(a), s, g),\
-                    trackingFileName=str(None), errorsFileName="{}/backtrackingErrors.txt".format(outputDir), offset=offset, limit=limit, alg=a, searchMode=s, guessMode=g)
-
-    # Read all generated files and merge
-    stats = pd.DataFrame()
-
-    for s in range(1,10):
-        for g in range (1,3):
-            for a in range(1,3):
-                data = pd.read_csv("{}/{}_search_{:0.0f}_guess_{:0.0f}.csv".format(outputDir, solver.getAlg(a), s, g))
-
-                data["algorithm"]=solver.getAlg(a)
-                data["search"]=s
-                data["guess"]=g
-
-                if stats.__len__()== 0:
-                    stats = data
-                else:
-                    stats = pd.concat((stats, data), axis=0)
-
-    # Generate execution time and backtracking plots, then save each.
-    for s in range(1,10):
-        for a in range(1,3):
-            toPlot = pd.DataFrame()
-            toPlot["Zeros"] = stats[(stats["algorithm"]==solver.getAlg(a)) & (stats["search"]==s)].groupby(by="Zeros").count().index
-            toPlot["Sequential"] = stats[(stats["algorithm"]==solver.getAlg(a)) & (stats["search"]==s) & (stats["guess"]==1)].groupby(by="Zeros")["Execution Time"].mean().values
-            toPlot["Random"] = stats[(stats["algorithm"]==solver.getAlg(a)) & (stats["search"]==s) & (stats["guess"]==2)].groupby(by="Zeros")["Execution Time"].mean().values
-
-            ax = toPlot.plot(x="Zeros", y=["Sequential", "Random"], kind="bar", rot=0, figsize=(10,6))
-            ax.set_ylabel("Mean execution time")
-            ax.set_title("{} - Search {} - Execution Analysis".format(solver.getAlg(a), solver.getSearchAlg(s)))
-            ax.figure.savefig("{}/{}_search_{:0.0f}_execution_time.PNG".format(outputDir, solver.getAlg(a), s))
-            ax.figure.clear()
-
-            toPlot = pd.DataFrame()
-            toPlot["Zeros"] = stats[(stats["algorithm"]==solver.getAlg(a)) & (stats["search"]==s)].groupby(by="Zeros").count().index
-            toPlot["Sequential"] = stats[(stats["algorithm"]==solver.getAlg(a)) & (stats["search"]==s) & (stats["guess"]==1)].groupby(by="Zeros")["Backtracks"].mean().values
-            toPlot["Random"] = stats[(stats["algorithm"]==solver.getAlg(a)) & (stats["search"]==s) & (stats["guess"]==2)].groupby(by="Zeros")["Backtracks"].mean().values
-
-            ax = toPlot.plot(x="Zeros", y=["Sequential", "Random"], kind="bar", rot=0, figsize=(10,6))
-            ax.set_ylabel("Mean Backtracks")
-            ax.set_title("{} - Search {} - Backtracks Analysis".format(solver.getAlg(a), solver.getSearchAlg(s)))
-            ax.figure.savefig("{}/{}_search_{:0.0f}_backtracks.PNG".format(outputDir, solver.getAlg(a), s))
-            ax.figure.clear()
+    import os
+    import tqdm
+    import itertools
+    import threading
+    import collections
+    import contextlib
+    import multiprocessing
+
+    offset, limit = getPuzzleRange(puzzlesFileName, offset, limit)
+
+    errorsFileName = "{}/backtrackingErrors.txt".format(outputDir)
+    checkpointFileName = "{}/sweep.ckpt".format(outputDir)
+    settings = {"puzzles": os.path.abspath(puzzlesFileName), "offset": offset, "limit": limit, \
+                "configurations": [list(configuration) for configuration in configurations], "warmup": warmup, "repeat": repeat}
+    statsFileNames = [getStatsFileName(outputDir, a, s, g) for a, s, g in configurations]
+    parts = list[pd.DataFrame]()
+
+    # Continue after the last checkpointed puzzle, taking back the results saved before it
+    completed = 0
+    checkpoint = sio.loadCheckpoint(checkpointFileName) if resume else None
+    if checkpoint is not None:
+        if checkpoint["settings"] != settings:
+            raise ValueError("Checkpoint {} was saved by a sweep with different settings: {}\n".format(checkpointFileName, checkpoint["settings"]))
+
+        completed = checkpoint["completed"]
+        for (a, s, g), statsFileName, position in zip(configurations, statsFileNames, checkpoint["positions"]):
+            os.truncate(statsFileName, position)
+            parts.append(readStats(statsFileName, a, s, g))
+
+    # Spread the configurations over the workers, each block mixing algorithms and modes to balance the load. With
+    # fewer configurations than workers, the other workers solve further chunks.
+    workers = max(workers, 1)
+    blockCount = max(min(workers, len(configurations)), 1)
+    blocks = [list(range(i, len(configurations), blockCount)) for i in range(blockCount)]
+
+    pool = None
+    stopReading = threading.Event()
+    queued = threading.Semaphore(workers * 2)
+    try:
+        with contextlib.ExitStack() as outputs:
+            header = ",".join(STATS_COLUMNS)
+            writers = [outputs.enter_context(sio.RecordWriter(statsFileName, "w", header) if checkpoint is None else sio.RecordWriter(statsFileName, "a")) \
+                       for statsFileName in statsFileNames]
+
+            def saveProgress():
+                sio.saveCheckpoint(checkpointFileName, {"settings": settings, "completed": completed, \
+                                                        "positions": [writer.getPosition() for writer in writers]})
+
+            rows = outputs.enter_context(sio.openPuzzles(puzzlesFileName, offset + completed, offset + limit))
+
+            # Keep the size of each chunk handed to the solver. Tasks read ahead of the solver are bounded, as the
+            # pool would otherwise queue the whole file.
+            chunkSizes = collections.deque()
+            def readTasks():
+                first = offset + completed + 1
+                for chunkIndex, chunk in enumerate(iter(lambda: [puzzle for puzzle, reference in itertools.islice(rows, chunkSize)], [])):
+                    chunkSizes.append(len(chunk))
+                    for blockIndex, block in enumerate(blocks):
+                        queued.acquire()
+                        if stopReading.is_set():
+                            return
+                        yield (chunkIndex, blockIndex), (list(range(first, first + len(chunk))), chunk, [configurations[i] for i in block], warmup, repeat)
+                    first += len(chunk)
+
+            if workers > 1:
+                pool = multiprocessing.Pool(workers)
+                results = pool.imap_unordered(sweepKeyedChunk, readTasks())
+            else:
+                results = map(sweepKeyedChunk, readTasks())
+
+            # Results which arrive ahead of an earlier task wait until it is merged
+            pending = dict[tuple[int, int], tuple]()
+            nextKey = (0, 0)
+            lastCheckpoint = completed
+            with tqdm.tqdm(total=limit, initial=completed) as progress:
+                for key, result in results:
+                    pending[key] = result
+
+                    while nextKey in pending:
+                        data, records, errors = pending.pop(nextKey)
+                        chunkIndex, blockIndex = nextKey
+                        queued.release()
+                        parts.append(data)
+
+                        for i, configurationRecords in zip(blocks[blockIndex], records):
+                            writers[i].writeAll(configurationRecords)
+                        for context, e in errors:
+                            spu.saveError(e, errorsFileName, context)
+
+                        # A chunk is complete once every block has solved it
+                        if blockIndex < len(blocks) - 1:
+                            nextKey = (chunkIndex, blockIndex + 1)
+                            continue
+
+                        nextKey = (chunkIndex + 1, 0)
+                        size = chunkSizes.popleft()
+                        completed += size
+                        progress.update(size)
+
+                        if completed - lastCheckpoint >= checkpointInterval:
+                            saveProgress()
+                            lastCheckpoint = completed
+
+            saveProgress()
+
+    finally:
+        # Let the reading of tasks end if it is waiting for the solver
+        stopReading.set()
+        queued.release()
+
+        if pool is not None:
+            pool.terminate()
+
+    # Merge the results of all tasks at once
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=RESULT_COLUMNS)
+
+def getStrata(puzzlesFileName: str, offset: int, limit: int, maxSamples: int, seed: int | None = None) -> dict[int, list[tuple[int, str]]]:
+    """
+    Draws a random sample of the puzzles of each number of zeros, in a single pass over the puzzles. Returns the
+    number and puzzle of the samples of each number of zeros, in random order.
+    Arguments:
+        puzzlesFileName: the file name of the puzzles.
+        offset: the number of puzzles to offset.
+        limit: the number of puzzles to consider.
+        maxSamples: the most puzzles drawn of each number of zeros.
+        seed: the seed of the random draws, None for a different sample every time.
+    """
+    import random
+
+    rng = random.Random(seed)
+    strata = dict[int, list[tuple[int, str]]]()
+    seen = dict[int, int]()
+
+    # Keep a uniform sample of every stratum by reservoir sampling
+    with sio.openPuzzles(puzzlesFileName, offset, offset + limit) as rows:
+        for number, (puzzle, reference) in enumerate(rows, offset + 1):
+            zeros = puzzle.count('0')
+            seen[zeros] = seen.get(zeros, 0) + 1
+            samples = strata.setdefault(zeros, list())
+
+            if len(samples) < maxSamples:
+                samples.append((number, puzzle))
+            else:
+                i = rng.randrange(seen[zeros])
+                if i < maxSamples:
+                    samples[i] = (number, puzzle)
+
+    for samples in strata.values():
+        rng.shuffle(samples)
+
+    return dict(sorted(strata.items()))
+
+def sample(puzzlesFileName: str, outputDir: str, configurations: list[tuple[int, int, int]], offset: int, limit: int, targetWidth: float, \
+           metric: str = "Execution Time", confidence: float = 0.95, minSamples: int = 10, maxSamples: int = 1000, batchSize: int = 10, \
+           warmup: int = 1, repeat: int = 5, workers: int = 1, seed: int | None = None) -> pd.DataFrame:
+    """
+    Solves a sample of the puzzles of each number of zeros with a number of configurations, only until the mean of a
+    metric is known well enough. Every configuration solves the same puzzles of a stratum in the same order, a batch
+    at a time, and stops once the confidence interval of its mean is narrower than the target relative to the mean,
+    once its mean is clearly worse than the best configuration of the stratum, or once the sample runs out. Returns the
+    results of all configurations as a frame of RESULT_COLUMNS, and writes the stats of each configuration to its
+    file in the output directory and the state of each configuration and stratum to sampling_summary.csv.
+    Arguments:
+        puzzlesFileName: the file name of the puzzles.
+        outputDir: the directory where to store all output.
+        configurations: the algorithm, search mode and guess mode of each configuration.
+        offset: the number of puzzles to offset.
+        limit: the limit number of puzzles to consider.
+        targetWidth: the half width of the confidence interval of the mean, relative to the mean, at which sampling stops.
+        metric: the column of the results whose mean is estimated.
+        confidence: the confidence level of the intervals.
+        minSamples: the fewest puzzles solved of a stratum before it can stop.
+        maxSamples: the most puzzles drawn of a stratum.
+        batchSize: the number of puzzles of a stratum solved at a time.
+        warmup: the number of untimed runs of each puzzle before timing.
+        repeat: the number of timed runs of each puzzle.
+        workers: the number of processes solving puzzles, 1 to solve them in the current process.
+        seed: the seed of the random draws, None for a different sample every time.
+    """
+    import math
+    import statistics
+    import contextlib
+    import multiprocessing
+
+    offset, limit = getPuzzleRange(puzzlesFileName, offset, limit)
+    strata = getStrata(puzzlesFileName, offset, limit, maxSamples, seed)
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    errorsFileName = "{}/backtrackingErrors.txt".format(outputDir)
+    algs = {solver.getAlg(a): a for a, s, g in configurations}
+    index = {configuration: i for i, configuration in enumerate(configurations)}
+
+    # Values of the metric, state and next sample of every configuration and stratum
+    values = {(configuration, zeros): list() for configuration in configurations for zeros in strata}
+    states = {cell: "sampling" for cell in values}
+    positions = dict.fromkeys(strata, 0)
+
+    def getInterval(cell) -> tuple[float, float]:
+        cellValues = values[cell]
+        mean = statistics.fmean(cellValues)
+        margin = z * statistics.stdev(cellValues) / math.sqrt(len(cellValues)) if len(cellValues) > 1 else math.inf
+        return mean, margin
+
+    pool = None
+    parts = list[pd.DataFrame]()
+    try:
+        with contextlib.ExitStack() as outputs:
+            header = ",".join(STATS_COLUMNS)
+            writers = [outputs.enter_context(sio.RecordWriter(getStatsFileName(outputDir, *configuration), "w", header)) for configuration in configurations]
+
+            if workers > 1:
+                pool = multiprocessing.Pool(workers)
+
+            while "sampling" in states.values():
+                # Hand the next batch of every stratum to the configurations still sampling it
+                tasks = list()
+                for zeros, samples in strata.items():
+                    active = [configuration for configuration in configurations if states[(configuration, zeros)] == "sampling"]
+                    if not active:
+                        continue
+
+                    batch = samples[positions[zeros]:positions[zeros] + batchSize]
+                    positions[zeros] += len(batch)
+
+                    blocks = max(min(workers, len(active)), 1)
+                    for i in range(blocks):
+                        tasks.append(([number for number, puzzle in batch], [puzzle for number, puzzle in batch], active[i::blocks], warmup, repeat))
+
+                results = pool.map(sweepChunk, tasks) if pool is not None else map(sweepChunk, tasks)
+                for (_, _, block, _, _), (data, records, errors) in zip(tasks, results):
+                    parts.append(data)
+
+                    for configuration, configurationRecords in zip(block, records):
+                        writers[index[configuration]].writeAll(configurationRecords)
+                    for context, e in errors:
+                        spu.saveError(e, errorsFileName, context)
+
+                    for (alg, s, g, zeros), cellValues in data.groupby(by=["algorithm", "search", "guess", "Zeros"])[metric]:
+                        values[((algs[alg], s, g), zeros)].extend(cellValues.tolist())
+
+                # Stop the configurations whose mean is known well enough or whose sample ran out
+                for zeros, samples in strata.items():
+                    for configuration in configurations:
+                        cell = (configuration, zeros)
+                        if states[cell] != "sampling":
+                            continue
+
+                        if len(values[cell]) >= minSamples:
+                            mean, margin = getInterval(cell)
+                            if margin <= targetWidth * abs(mean):
+                                states[cell] = "converged"
+                                continue
+
+                        if positions[zeros] >= len(samples):
+                            states[cell] = "exhausted"
+
+                    # Stop the configurations whose interval lies wholly above the interval of the best configuration
+                    intervals = {configuration: getInterval((configuration, zeros)) for configuration in configurations \
+                                 if len(values[(configuration, zeros)]) >= minSamples}
+                    if intervals:
+                        best = min(mean + margin for mean, margin in intervals.values())
+                        for configuration, (mean, margin) in intervals.items():
+                            if states[(configuration, zeros)] == "sampling" and mean - margin > best:
+                                states[(configuration, zeros)] = "dominated"
+
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    # Save the state of every configuration and stratum
+    summary = list[dict]()
+    for (configuration, zeros), state in states.items():
+        a, s, g = configuration
+        mean, margin = getInterval((configuration, zeros)) if values[(configuration, zeros)] else (math.nan, math.nan)
+        summary.append({"algorithm": solver.getAlg(a), "search": s, "guess": g, "Zeros": zeros, "puzzles": len(strata[zeros]), \
+                        "solved": len(values[(configuration, zeros)]), "{} Mean".format(metric): mean, "{} Margin".format(metric): margin, "state": state})
+    summary = pd.DataFrame(summary)
+    summary.to_csv("{}/sampling_summary.csv".format(outputDir), index=False)
+
+    print("Solved {:0.0f} of {:0.0f} puzzles and configurations, {:0.0f} converged, {:0.0f} dominated and {:0.0f} exhausted."\
+        .format(summary["solved"].sum(), limit * len(configurations), (summary["state"] == "converged").sum(), \
+            (summary["state"] == "dominated").sum(), (summary["state"] == "exhausted").sum()))
+
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=RESULT_COLUMNS)
+
+def evaluate(puzzlesFileName: str, outputDir: str, offset: int, limit: int, resume: bool = False, algs: list[int] | None = None, \
+             searchModes: list[int] | None = None, guessModes: list[int] | None = None, warmup: int = 1, repeat: int = 5, \
+             workers: int = 1, chunkSize: int = 16, cache: bool = True, baselineDir: str | None = None, targetWidth: float | None = None, \
+             minSamples: int = 10, maxSamples: int = 1000, batchSize: int = 10, seed: int | None = None, sampleMetric: str = "Execution Time"):
+    """
+    Evaluates the implemented algorithms and variations, for a limit number of puzzles. The results of every
+    configuration are cached by the hash of the puzzles, of the code of the algorithm and of the settings, so only
+    the configurations with no cached results are solved again. With a target width, puzzles are sampled by number
+    of zeros instead, as by sample, and nothing is cached.
+    Arguments:
+        puzzlesFileName: the file name of the puzzles.
+        outputDir: the directory where to store all output.
+        offset: the number of puzzles to offset.
+        limit: the limit number of puzzles to consider.
+        resume: whether to continue from the checkpoint of a previous evaluation.
+        algs: the algorithm identifiers to evaluate, all when None.
+        searchModes: the search modes to evaluate, all when None.
+        guessModes: the guess modes to evaluate, all when None.
+        warmup: the number of untimed runs of each puzzle before timing.
+        repeat: the number of timed runs of each puzzle.
+        workers: the number of processes solving puzzles.
+        chunkSize: the number of puzzles solved by each task of a worker.
+        cache: whether cached results are used, otherwise every configuration is solved and its cached results replaced.
+        baselineDir: the output directory of a baseline evaluation to compare with, if any.
+        targetWidth: the relative half width of the confidence interval of the mean of the sampled metric at which the sampling
+            of a configuration and number of zeros stops, None to solve every puzzle.
+        minSamples: the fewest puzzles of a number of zeros solved when sampling.
+        maxSamples: the most puzzles of a number of zeros drawn when sampling.
+        batchSize: the number of puzzles of a number of zeros solved at a time when sampling.
+        seed: the seed of the sampling, None for a different sample every time.
+        sampleMetric: the column of the results whose mean decides when sampling stops.
+    """
+    import os
+    import shutil
+    import matplotlib.pyplot as plt
+    import benchmarkReport as br
+
+    configurations = getConfigurations(algs, searchModes, guessModes)
+    offset, limit = getPuzzleRange(puzzlesFileName, offset, limit)
+
+    if targetWidth is not None:
+        # Solve samples of each number of zeros only until the mean of the metric of each configuration is known well enough
+        stats = sample(puzzlesFileName, outputDir, configurations, offset, limit, targetWidth, sampleMetric, minSamples=minSamples, maxSamples=maxSamples, \
+                       batchSize=batchSize, warmup=warmup, repeat=repeat, workers=workers, seed=seed)
+    else:
+        # Find the cached results of every configuration
+        cacheDir = "{}/cache".format(outputDir)
+        os.makedirs(cacheDir, exist_ok=True)
+
+        puzzlesHash = hashPuzzles(puzzlesFileName, offset, limit)
+        modulesHashes = {a: hashModules(SHARED_MODULES + SOLVER_MODULES[a]) for a in {a for a, s, g in configurations}}
+        cacheFileNames = {(a, s, g): "{}/{}.csv".format(cacheDir, getCacheKey(puzzlesHash, modulesHashes[a], a, s, g, warmup, repeat)) \
+                          for a, s, g in configurations}
+
+        parts = list[pd.DataFrame]()
+        missing = list[tuple[int, int, int]]()
+        for configuration in configurations:
+            if cache and os.path.exists(cacheFileNames[configuration]):
+                shutil.copyfile(cacheFileNames[configuration], getStatsFileName(outputDir, *configuration))
+                parts.append(readStats(cacheFileNames[configuration], *configuration))
+            else: missing.append(configuration)
+
+        print("Found {:0.0f} of {:0.0f} configurations in the cache.".format(len(configurations) - len(missing), len(configurations)))
+
+        # Solve every puzzle with the configurations not cached, collecting the statistics in memory, then cache them
+        if missing:
+            parts.append(sweep(puzzlesFileName, outputDir, missing, offset, limit, warmup, repeat, workers, chunkSize, resume=resume))
+
+            for configuration in missing:
+                shutil.copyfile(getStatsFileName(outputDir, *configuration), cacheFileNames[configuration] + ".tmp")
+                os.replace(cacheFileNames[configuration] + ".tmp", cacheFileNames[configuration])
+
+        stats = pd.concat(parts, ignore_index=True)
+
+    # Record how execution times were measured, so reports compare them only with times measured the same way
+    timingKey = br.getTimingKey(warmup, repeat)
+    br.updateManifest(outputDir, [getStatsFileName(outputDir, *configuration) for configuration in configurations], timingKey)
+    stats[br.TIMING_COLUMN] = timingKey
 
     # Generate and save all stats
     aggregatedStats = stats.groupby(by=["algorithm", "search", "guess", "Zeros"])\
                         .aggregate({"Execution Time": ["count", "min", "max", "mean",], "Guesses": ["min", "max", "mean"], "Backtracks": ["min", "max", "mean"]})
     aggregatedStats.to_csv("{}/prototype_analysis.csv".format(outputDir))
 
+    # Report intervals and percentiles, and compare them with the baseline
+    verdict = br.report(stats, outputDir, br.readResults(baselineDir) if baselineDir is not None else None)
+    if verdict is not None:
+        print("Verdict: {}, {:0.0f} regressions and {:0.0f} improvements in {:0.0f} comparisons.".format(verdict["verdict"], \
+            len(verdict["regressions"]), len(verdict["improvements"]), verdict["compared"]))
+
+    # Generate execution time and backtracking plots from the aggregated means, with a bar per guess mode, then save each.
+    plots = (("Execution Time", "Mean execution time", "Execution Analysis", "execution_time"), ("Backtracks", "Mean Backtracks", "Backtracks Analysis", "backtracks"))
+    for column, label, title, suffix in plots:
+        means = aggregatedStats[(column, "mean")].unstack("guess").rename(columns=solver.getGuessAlg).rename_axis(columns=None)
+
+        for (alg, s), toPlot in means.groupby(level=["algorithm", "search"]):
+            ax = toPlot.droplevel(["algorithm", "search"]).plot(kind="bar", rot=0, figsize=(10,6))
+            ax.set_ylabel(label)
+            ax.set_title("{} - Search {} - {}".format(alg, solver.getSearchAlg(s), title))
+            ax.figure.savefig("{}/{}_search_{:0.0f}_{}.PNG".format(outputDir, alg, s, suffix))
+            plt.close(ax.figure)
+
 def main():
     import argparse
 
@@ -81,9 +605,53 @@ def main():
     parser.add_argument("outputDir", help="The directory where to store the files.", type=str)
     parser.add_argument("offset", help="The number of puzzles to offset from the file.", type=int)
     parser.add_argument("limit", help="The max number of puzzles to consider.", type=int)
+    parser.add_argument("--resume", help="Continue from the checkpoint of a previous evaluation.", action="store_true")
+    parser.add_argument("--algorithms", help="Comma separated algorithm identifiers to evaluate, all by default.", type=str, default=None)
+    parser.add_argument("--searches", help="Comma separated search modes to evaluate, all by default.", type=str, default=None)
+    parser.add_argument("--guesses", help="Comma separated guess modes to evaluate, all by default.", type=str, default=None)
+    parser.add_argument("--warmup", help="The number of untimed runs of each puzzle before timing.", type=int, default=1)
+    parser.add_argument("--repeat", help="The number of timed runs of each puzzle.", type=int, default=5)
+    parser.add_argument("--workers", help="The number of processes solving puzzles.", type=int, default=1)
+    parser.add_argument("--chunk-size", help="The number of puzzles solved by each task of a worker.", type=int, default=16)
+    parser.add_argument("--baseline", help="The output directory of a baseline evaluation to compare with.", type=str, default=None)
+    parser.add_argument("--target-width", help="Sample puzzles by number of zeros until the confidence interval of the mean of the sampled metric is narrower than this fraction of the mean.", type=float, default=None)
+    parser.add_argument("--sample-metric", help="The metric whose mean decides when sampling stops.", type=str, choices=["Execution Time", "Guesses", "Backtracks"], default="Execution Time")
+    parser.add_argument("--min-samples", help="The fewest puzzles of a number of zeros solved when sampling.", type=int, default=10)
+    parser.add_argument("--max-samples", help="The most puzzles of a number of zeros drawn when sampling.", type=int, default=1000)
+    parser.add_argument("--batch-size", help="The number of puzzles of a number of zeros solved at a time when sampling.", type=int, default=10)
+    parser.add_argument("--seed", help="The seed of the sampling.", type=int, default=None)
+    parser.add_argument("--no-cache", help="Solve every configuration again, replacing its cached results.", action="store_true")
     args = parser.parse_args()
 
-    evaluate(args.puzzlesFileName, args.outputDir, args.offset, args.limit)
+    # Parse the requested configurations
+    def parseModes(value: str | None, name: str, count: int) -> list[int] | None:
+        if value is None:
+            return None
+        try:
+            modes = [int(mode) for mode in value.split(",")]
+        except ValueError:
+            parser.error("{} must be comma separated numbers".format(name))
+        if any(mode < 1 or mode > count for mode in modes):
+            parser.error("{} must be from 1 to {}".format(name, count))
+        return modes
+
+    algs = parseModes(args.algorithms, "--algorithms", 5)
+    searchModes = parseModes(args.searches, "--searches", 12)
+    guessModes = parseModes(args.guesses, "--guesses", 2)
+    if args.warmup < 0 or args.repeat < 1:
+        parser.error("The warmup must not be negative and the repeat must be at least 1")
+    if args.workers < 1 or args.chunk_size < 1:
+        parser.error("The number of workers and the chunk size must be at least 1")
+    if args.target_width is not None and args.target_width <= 0:
+        parser.error("The target width must be positive")
+    if args.target_width is not None and (args.resume or args.no_cache):
+        parser.error("--resume and --no-cache do not apply to sampling with --target-width")
+    if args.min_samples < 2 or args.max_samples < args.min_samples or args.batch_size < 1:
+        parser.error("The minimum samples must be at least 2, the maximum samples at least the minimum and the batch size at least 1")
+
+    evaluate(args.puzzlesFileName, args.outputDir, args.offset, args.limit, args.resume, algs, searchModes, guessModes, args.warmup, args.repeat, \
+        args.workers, args.chunk_size, not args.no_cache, args.baseline, \
+        args.target_width, args.min_samples, args.max_samples, args.batch_size, args.seed, args.sample_metric)
     
 if (__name__=="__main__"):
     main()
\ No newline at end of file
@@ -8,228 +8,452 @@ Implementation of rule-based with backtracking sudoku solver algorithm.
 """
 import sudokuPuzzleUtils as spu
 
-def removeValueInRow(validValues: dict[tuple[int, int], list[int]], row: int, val: int):
+class PropagationQueue:
     """
-    Removes a value from the valid values dictionary for an entire row.
+    The cells and units waiting to be checked for naked singles and lone rangers. Only the cells whose
+    candidates changed, and the units holding them, are queued after each placement, so propagation work
+    follows the number of changes rather than sweeps of the whole board.
+    """
+    def __init__(self, cells=(), units=()):
+        self.cells = list(cells)
+        self.units = list(units)
+        self.queuedCells = set(self.cells)
+        self.queuedUnits = set(self.units)
+
+    @classmethod
+    def full(cls, validValues: dict[tuple[int, int], int]):
+        """
+        Creates a queue holding every unsolved cell and every unit.
+        Arguments:
+            validValues: the candidate masks of the unfilled positions.
+        """
+        return cls(sorted(validValues, reverse=True), range(len(spu.UNITS) - 1, -1, -1))
+
+    def __bool__(self) -> bool:
+        """
+        Checks if anything is left to propagate.
+        """
+        return bool(self.cells) or bool(self.units)
+
+    def pushCell(self, pos: tuple[int, int]):
+        """
+        Queues a cell whose candidates changed, together with its units.
+        Arguments:
+            pos: the row and column position.
+        """
+        if pos not in self.queuedCells:
+            self.queuedCells.add(pos)
+            self.cells.append(pos)
+
+        self.pushUnits(pos)
+
+    def pushUnits(self, pos: tuple[int, int]):
+        """
+        Queues the row, column and box of a cell.
+        Arguments:
+            pos: the row and column position.
+        """
+        for unit in spu.UNITS_OF[pos]:
+            if unit not in self.queuedUnits:
+                self.queuedUnits.add(unit)
+                self.units.append(unit)
+
+    def popCell(self) -> tuple[int, int]:
+        """
+        Takes the next cell to check for a naked single.
+        """
+        pos = self.cells.pop()
+        self.queuedCells.discard(pos)
+        return pos
+
+    def popUnit(self) -> int:
+        """
+        Takes the index of the next unit to check for lone rangers.
+        """
+        unit = self.units.pop()
+        self.queuedUnits.discard(unit)
+        return unit
+
+def assign(board: list[list[int]], validValues: dict[tuple[int, int], int], history: list[str] | None, state: spu.BoardState, \
+           trail: list[tuple[tuple[int, int], int, bool]] | None, pos: tuple[int, int], val: int, queue: PropagationQueue | None = None, \
+           stats: spu.SudokuStats | None = None) -> bool:
+    """
+    Places a value and removes it from the candidates of the peers. Every change is recorded in the trail, when
+    given, so it can be undone, and the affected cells and units are queued for propagation. Returns False if a
+    peer is left without candidates.
     Arguments:
-        validValues: the current cache of valid values.
-        row: the row identification number.
-        val: the value to remove.
+        board: the 9x9 sudoku board.
+        validValues: the candidate masks of the unfilled positions.
+        history: a history of solutions.
+        state: the board state tracking the values in each row, column and box.
+        trail: the changes made so far, as (position, previous mask, placed) entries.
+        pos: the row and column position to be filled in.
+        val: the value to be inserted.
+        queue: the cells and units waiting to be propagated.
+        stats: The statistics object to record eliminations.
     """
-    for pos in validValues:
-        if pos[0]!=row:
-            continue
+    vals = validValues.pop(pos)
+    if trail is not None:
+        trail.append((pos, vals, True))
+    state.place(pos, val)
 
-        vals = validValues.get(pos)
-        if vals is None:
+    if history is not None:
+        history.append(spu.toStr(board))
+
+    # The other candidates of the cell may now have a single place left in its units
+    if queue is not None:
+        queue.pushUnits(pos)
+
+    bit = spu.DIGIT_MASK[val]
+    for peer in spu.PEERS[pos]:
+        vals = validValues.get(peer)
+        if vals is None or not vals & bit:
             continue
 
-        if vals.__contains__(val):
-            vals.remove(val)
-            validValues[pos]= vals
+        if trail is not None:
+            trail.append((peer, vals, False))
+        vals &= ~bit
+        validValues[peer] = vals
+        if __debug__ and stats is not None:
+            stats.eliminations += 1
+        if not vals:
+            return False
+
+        if queue is not None:
+            queue.pushCell(peer)
 
-def removeValueInCol(validValues: dict[tuple[int, int], list[int]], col: int, val: int):
+    return True
+
+def undo(board: list[list[int]], validValues: dict[tuple[int, int], int], history: list[str] | None, state: spu.BoardState, \
+         trail: list[tuple[tuple[int, int], int, bool]], mark: int):
     """
-    Removes a value from the valid values dictionary for an entire column.
+    Undoes the changes recorded in the trail after a mark, latest first.
     Arguments:
-        validValues: the current cache of valid values.
-        col: the column identification number.
-        val: the value to remove.
+        board: the 9x9 sudoku board.
+        validValues: the candidate masks of the unfilled positions.
+        history: a history of solutions.
+        state: the board state tracking the values in each row, column and box.
+        trail: the changes made so far.
+        mark: the trail length to go back to.
     """
-    for pos in validValues:
-        if pos[1]!=col:
-            continue
-
-        vals = validValues.get(pos)
-        if vals is None:
-            continue
+    while len(trail) > mark:
+        pos, vals, placed = trail.pop()
+        if placed:
+            if history is not None:
+                history.remove(spu.toStr(board))
+            state.unplace(pos)
 
-        if vals.__contains__(val):
-            vals.remove(val)
-            validValues[pos]= vals
+        validValues[pos] = vals
 
-def removeValueInBox(validValues: dict[tuple[int, int], list[int]], pos: tuple[int,int], val: int):
+def propagate(board: list[list[int]], validValues: dict[tuple[int, int], int], history: list[str] | None, state: spu.BoardState, \
+              trail: list[tuple[tuple[int, int], int, bool]] | None, queue: PropagationQueue, stats: spu.SudokuStats | None = None) -> bool:
     """
-    Removes a value from the valid values dictionary for an entire column.
+    Applies naked singles to the queued cells and lone rangers to the queued units until the queue is empty.
+    Returns False if the board is found to be inconsistent.
     Arguments:
-        validValues: the current cache of valid values.
-        pos: the position being investigated.
-        val: the value to remove.
+        board: the 9x9 sudoku board.
+        validValues: the candidate masks of the unfilled positions.
+        history: a history of solutions.
+        state: the board state tracking the values in each row, column and box.
+        trail: the changes made so far.
+        queue: the cells and units waiting to be propagated.
+        stats: The statistics object to record eliminations.
     """
-    positions = spu.getBoxPositionsByPos(pos)
-    for position in positions:
-        vals = validValues.get(position)
-        if vals is None:
+    while queue:
+        # Naked singles
+        if queue.cells:
+            pos = queue.popCell()
+            vals = validValues.get(pos)
+            if vals is None:
+                continue
+
+            count = spu.MASK_COUNT[vals]
+            if count == 0:
+                return False
+            if count == 1 and not assign(board, validValues, history, state, trail, pos, spu.MASK_VALUES[vals][0], queue, stats):
+                return False
             continue
-        
-        if vals.__contains__(val):
-            vals.remove(val)
-            validValues[position] = vals
 
-def updateBoard(board: list[list[int]], validValues: dict[tuple[int, int], list[int]], history: list[str] | None, pos: tuple[int,int], val: int):
+        # Lone rangers
+        unit = spu.UNITS[queue.popUnit()]
+        once = twice = used = 0
+        for pos in unit:
+            vals = validValues.get(pos)
+            if vals is None:
+                used |= spu.DIGIT_MASK[board[pos[0]][pos[1]]]
+                continue
+            twice |= once & vals
+            once |= vals
+
+        # A missing value with no possible cell
+        missing = spu.ALL_DIGITS & ~used
+        if missing & ~once:
+            return False
+
+        for val in spu.MASK_VALUES[once & ~twice & missing]:
+            bit = spu.DIGIT_MASK[val]
+            pos = next((pos for pos in unit if validValues.get(pos, 0) & bit), None)
+            if pos is None or not assign(board, validValues, history, state, trail, pos, val, queue, stats):
+                return False
+
+    return True
+
+def eliminate(validValues: dict[tuple[int, int], int], trail: list[tuple[tuple[int, int], int, bool]] | None, queue: PropagationQueue | None, \
+              pos: tuple[int, int], mask: int) -> int:
     """
-    Updates the board and valid values.
+    Removes candidates from a cell, recording the change in the trail and queueing the cell for propagation.
+    Returns the number of candidates removed.
     Arguments:
-        board: the 9x9 sudoku board.
-        validValues: a dictionary with valid values for unfilled positions in the board.
-        history: a history of solutions.
-        pos: the row and column position to be filled in.
-        val: the value to be inserted.
+        validValues: the candidate masks of the unfilled positions.
+        trail: the changes made so far.
+        queue: the cells and units waiting to be propagated.
+        pos: the row and column position.
+        mask: the candidates to remove.
     """
-    board[pos[0]][pos[1]]=val
+    vals = validValues[pos]
+    if not vals & mask:
+        return 0
 
-    if history is not None:
-        history.append(spu.toStr(board))
+    if trail is not None:
+        trail.append((pos, vals, False))
+    validValues[pos] = vals & ~mask
 
-    removeValueInRow(validValues, pos[0], val)
-    removeValueInCol(validValues, pos[1], val)
-    removeValueInBox(validValues, pos, val)
+    if queue is not None:
+        queue.pushCell(pos)
 
-def solveNakedSingle(board: list[list[int]], validValues: dict[tuple[int, int], list[int]], history: list[str] | None) -> bool:
+    return spu.MASK_COUNT[vals & mask]
+
+def getDigitCells(validValues: dict[tuple[int, int], int], unit: list[tuple[int, int]]) -> list[list[tuple[int, int]]]:
     """
-    Identifies if a single valid value is possible in a cell and applies it.
+    Gets the unfilled cells of a unit where each digit is a candidate, indexed by digit.
     Arguments:
-        board: the sudoku puzzle to process.
-        validValues: a dictionary with valid values for various positions.
-        history: a log of solutions.
+        validValues: the candidate masks of the unfilled positions.
+        unit: the positions of the unit.
     """
-    posToDel = list[tuple[int,int]]()
-    for pos in validValues:
+    cells = [list[tuple[int, int]]() for _ in range(0,10)]
+    for pos in unit:
         vals = validValues.get(pos)
         if vals is None:
             continue
-        
-        if vals.__len__()== 1:
-            updateBoard(board, validValues, history, pos, vals[0])
-            posToDel.append(pos)
 
-    # Remove all positions from the dictionary now and not before so not to change the structure during the loop
-    for pos in posToDel:
-        del validValues[pos]
+        for val in spu.MASK_VALUES[vals]:
+            cells[val].append(pos)
 
-    # Return if a change took place
-    return posToDel.__len__()>0
+    return cells
 
-def findLoneRanger(vals: list[int], positions: dict[int, list[tuple[int,int]]], pos: tuple[int, int]):
+def solveNakedSubsets(validValues: dict[tuple[int, int], int], trail: list | None, queue: PropagationQueue | None, size: int) -> int:
     """
-    Finds the position of a cells that have lone rangers.
+    Finds groups of cells in a unit whose candidates are limited to as many values as cells (naked pairs and
+    triples), and removes those values from the rest of the unit.
     Arguments:
-        vals: the valid values.
-        positions: a dictionary containing the positions where values are possible.
-        pos: the position being considered
+        validValues: the candidate masks of the unfilled positions.
+        trail: the changes made so far.
+        queue: the cells and units waiting to be propagated.
+        size: the number of cells in a group.
     """
-    for val in vals:
-        # Get the current valid positions for the current value
-        cells = list[tuple[int, int]]()
-        current = positions.get(val)
-        if current is not None:
-            cells.extend(current)
+    from itertools import combinations
 
-        # Add the current cell and update
-        cells.append(pos)
-        positions[val]=cells
+    removed = 0
+    for unit in spu.UNITS:
+        cells = [pos for pos in unit if pos in validValues and 2 <= spu.MASK_COUNT[validValues[pos]] <= size]
+        for group in combinations(cells, size):
+            mask = 0
+            for pos in group:
+                mask |= validValues[pos]
 
-def applyLoneRanger(board: list[list[int]], validValues: dict[tuple[int, int], list[int]], history: list[str] | None, positions: dict[int, list[tuple[int,int]]], posToDel: list[tuple[int,int]]):
-    """
-    Applies the lone ranger logic, thus solving a cell and updating the valid values.
-    Arguments:
-        board: the 9x9 sudoku board.
-        validValues: the valid values on the board for unsolved cells.
-        history: the history of solutions.
-        positions: the positions where values are possible in a specific axis (row, column or box).
-        posToDel: the list of position to remove.
-    """
-    for val in positions:
-        cells = positions.get(val)
-        if cells is None:
-            continue
+            if spu.MASK_COUNT[mask] != size:
+                continue
 
-        if cells.__len__() != 1:
-            continue
+            for pos in unit:
+                if pos in validValues and pos not in group:
+                    removed += eliminate(validValues, trail, queue, pos, mask)
 
-        updateBoard(board, validValues, history, cells[0], val)
-        posToDel.append(cells[0])
+    return removed
 
-def solveLoneRanger(board: list[list[int]], validValues: dict[tuple[int, int], list[int]], history: list[str] | None) -> bool:
+def solveHiddenSubsets(validValues: dict[tuple[int, int], int], trail: list | None, queue: PropagationQueue | None, size: int) -> int:
     """
-    Identifies if a value is possible in only one cell.
+    Finds groups of values in a unit which are only possible in as many cells as values (hidden pairs and
+    triples), and removes all other candidates from those cells.
     Arguments:
-        board: the sudoku puzzle to process.
-        validValues: a dictionary with valid values for various positions.
-        history: a log of solutions.
-    """
-    posToDel = list[tuple[int,int]]()
-
-    # Search by row and register the positions for each valid value in each column
-    for row in range(0,9):
-        positions = dict[int, list[tuple[int,int]]]()
-        for col in range(0, 9):
-            # Get the valid values for the current cell
-            vals = validValues.get((row, col))
-            if vals is None:
+        validValues: the candidate masks of the unfilled positions.
+        trail: the changes made so far.
+        queue: the cells and units waiting to be propagated.
+        size: the number of values in a group.
+    """
+    from itertools import combinations
+
+    removed = 0
+    for unit in spu.UNITS:
+        digitCells = getDigitCells(validValues, unit)
+        digits = [val for val in range(1,10) if 2 <= len(digitCells[val]) <= size]
+        for group in combinations(digits, size):
+            cells = set[tuple[int, int]]()
+            for val in group:
+                cells.update(digitCells[val])
+
+            if len(cells) != size:
                 continue
 
-            findLoneRanger(vals, positions, (row, col))
+            mask = spu.ALL_DIGITS & ~spu.toMask(group)
+            for pos in cells:
+                removed += eliminate(validValues, trail, queue, pos, mask)
 
-        applyLoneRanger(board, validValues, history, positions, posToDel)
+    return removed
 
-    # Search by col
-    for col in range(0, 9):
-        positions = dict[int, list[tuple[int,int]]]()
-        for row in range(0, 9):
-            # Get the valid values for the current cell
-            vals = validValues.get((row, col))
-            if vals is None:
+def solvePointingPairs(validValues: dict[tuple[int, int], int], trail: list | None, queue: PropagationQueue | None) -> int:
+    """
+    Finds values whose candidates in a box all lie in one row or column, and removes them from the rest of
+    that row or column.
+    Arguments:
+        validValues: the candidate masks of the unfilled positions.
+        trail: the changes made so far.
+        queue: the cells and units waiting to be propagated.
+    """
+    removed = 0
+    for box in range(18, 27):
+        digitCells = getDigitCells(validValues, spu.UNITS[box])
+        for val in range(1,10):
+            cells = digitCells[val]
+            if len(cells) < 2:
                 continue
 
-            findLoneRanger(vals, positions, (row, col))
+            bit = spu.DIGIT_MASK[val]
+            for line in (spu.UNITS_OF[cells[0]][0], spu.UNITS_OF[cells[0]][1]):
+                if all(line in spu.UNITS_OF[pos] for pos in cells):
+                    for pos in spu.UNITS[line]:
+                        if pos in validValues and spu.UNITS_OF[pos][2] != box:
+                            removed += eliminate(validValues, trail, queue, pos, bit)
 
-        applyLoneRanger(board, validValues, history, positions, posToDel)
+    return removed
 
-    # Search by box
-    for box in range(0,9): 
-        positions = dict[int, list[tuple[int,int]]]()
-        for pos in spu.getBoxPositions(box):
-            # Get the valid values for the current cell
-            vals = validValues.get(pos)
-            if vals is None:
+def solveBoxLineReduction(validValues: dict[tuple[int, int], int], trail: list | None, queue: PropagationQueue | None) -> int:
+    """
+    Finds values whose candidates in a row or column all lie in one box, and removes them from the rest of
+    that box.
+    Arguments:
+        validValues: the candidate masks of the unfilled positions.
+        trail: the changes made so far.
+        queue: the cells and units waiting to be propagated.
+    """
+    removed = 0
+    for line in range(0, 18):
+        digitCells = getDigitCells(validValues, spu.UNITS[line])
+        for val in range(1,10):
+            cells = digitCells[val]
+            if len(cells) < 2:
                 continue
 
-            findLoneRanger(vals, positions, pos)
-
-        applyLoneRanger(board, validValues, history, positions, posToDel)
+            box = spu.UNITS_OF[cells[0]][2]
+            if any(spu.UNITS_OF[pos][2] != box for pos in cells):
+                continue
 
-    # Remove all positions from the dictionary now and not before so not to change the structure during the loop
-    for pos in posToDel:
-        del validValues[pos]
+            bit = spu.DIGIT_MASK[val]
+            for pos in spu.UNITS[box]:
+                if pos in validValues and line not in spu.UNITS_OF[pos]:
+                    removed += eliminate(validValues, trail, queue, pos, bit)
 
-    # Return if a change took place
-    return posToDel.__len__()>0
+    return removed
 
-def solve(board: list[list[int]], validValues: dict[tuple[int,int], list[int]], history: list[str], stats: spu.SudokuStats | None, searchMode: int, guessMode: int) -> bool:
+def solveXWing(validValues: dict[tuple[int, int], int], trail: list | None, queue: PropagationQueue | None) -> int:
+    """
+    Finds values possible in exactly the same two columns of two rows, and removes them from the rest of
+    those columns, and likewise with rows and columns swapped.
+    Arguments:
+        validValues: the candidate masks of the unfilled positions.
+        trail: the changes made so far.
+        queue: the cells and units waiting to be propagated.
+    """
+    removed = 0
+    for base, cross in ((0, 1), (1, 0)):
+        for val in range(1,10):
+            bit = spu.DIGIT_MASK[val]
+
+            # Lines where the value has exactly two places, keyed by the crossing positions
+            pairs = dict[tuple[int, int], int]()
+            for line in range(0,9):
+                places = tuple(pos[cross] for pos in spu.UNITS[base*9 + line] if validValues.get(pos, 0) & bit)
+                if len(places) != 2:
+                    continue
+
+                other = pairs.get(places)
+                if other is None:
+                    pairs[places] = line
+                    continue
+
+                for place in places:
+                    for pos in spu.UNITS[cross*9 + place]:
+                        if pos in validValues and pos[base] not in (line, other):
+                            removed += eliminate(validValues, trail, queue, pos, bit)
+
+    return removed
+
+# Rules applied once singles are exhausted, cheapest first
+RULES = {
+    "nakedPairs": lambda validValues, trail, queue: solveNakedSubsets(validValues, trail, queue, 2),
+    "hiddenPairs": lambda validValues, trail, queue: solveHiddenSubsets(validValues, trail, queue, 2),
+    "pointingPairs": solvePointingPairs,
+    "boxLineReduction": solveBoxLineReduction,
+    "nakedTriples": lambda validValues, trail, queue: solveNakedSubsets(validValues, trail, queue, 3),
+    "hiddenTriples": lambda validValues, trail, queue: solveHiddenSubsets(validValues, trail, queue, 3),
+    "xWing": solveXWing,
+}
+
+def applyRules(board: list[list[int]], validValues: dict[tuple[int, int], int], history: list[str] | None, stats: spu.SudokuStats | None, state: spu.BoardState, \
+               trail: list[tuple[tuple[int, int], int, bool]] | None, queue: PropagationQueue, rules: list[str]) -> bool:
+    """
+    Propagates singles, then applies the first rule that removes candidates and propagates again, until no rule
+    makes progress. Returns False if the board is found to be inconsistent.
+    Arguments:
+        board: the 9x9 sudoku board.
+        validValues: the candidate masks of the unfilled positions.
+        history: a history of solutions.
+        stats: The statistics object to record rule applications.
+        state: the board state tracking the values in each row, column and box.
+        trail: the changes made so far.
+        queue: the cells and units waiting to be propagated.
+        rules: the names of the rules in RULES to apply, in order.
+    """
+    while True:
+        if __debug__ and stats is not None:
+            stats.incrementRound("singles")
+        if not propagate(board, validValues, history, state, trail, queue, stats):
+            return False
+
+        # A filled board leaves nothing for the other rules
+        if not validValues:
+            return True
+
+        for rule in rules:
+            if __debug__ and stats is not None:
+                stats.incrementRound(rule)
+            removed = RULES[rule](validValues, trail, queue)
+            if removed:
+                if stats is not None:
+                    stats.incrementRule(rule, removed)
+                    if __debug__:
+                        stats.eliminations += removed
+                break
+        else:
+            return True
+
+def solve(board: list[list[int]], validValues: dict[tuple[int,int], int], history: list[str], stats: spu.SudokuStats | None, searchMode: int, guessMode: int, \
+          rules: list[str] | None = None) -> bool:
     """
     Solves a sudoku puzzle by using some rules, then backtracking when guesses are needed.
     Arguments:
         board: the 9x9 puzzle to be solved.
-        validValues: the possible values for each unsolved cell.
+        validValues: the candidate mask of possible values for each unsolved cell.
         history: a list containing a history of solutions for tracking.
         stats: The statistics object to record algorithm.
         searchMode: the mode how the next empty cell is found.
         guessMode: the mode how the next number is guessed.
+        rules: the names of the rules in RULES to apply besides singles, none when None.
     """
-    while True:
-        # Check for naked single
-        if solveNakedSingle(board, validValues, history):
-            continue
-
-        # Check for lone ranger
-        if solveLoneRanger(board, validValues, history):
-            continue
-
-        # TODO: implement more rules
+    state = spu.BoardState(board)
 
-        # No cell was solved so only guesses left or puzzle is solved
-        break
+    # Apply naked singles and lone rangers, revisiting only what each placement affects, then the other rules
+    if not applyRules(board, validValues, history, stats, state, None, PropagationQueue.full(validValues), [] if rules is None else rules):
+        return False
 
     # Check if puzzle is solved
     if spu.isSolved(board):
@@ -237,4 +461,105 @@ def solve(board: list[list[int]], validValues: dict[tuple[int,int], list[int]],
 
     # Only guesses are left so solve using backtracking
     import backtracking as bk
-    return bk.solve(board, validValues, history, stats=stats, searchMode=searchMode, guessMode=guessMode)  
\ No newline at end of file
+    return bk.solve(board, validValues, history, stats=stats, searchMode=searchMode, guessMode=guessMode, state=state)
+
+def findBranchCell(board: list[list[int]], validValues: dict[tuple[int, int], int], searchMode: int) -> tuple[int, int] | None:
+    """
+    Finds the cell to guess next. The most constrained modes use the candidate masks, which are kept exact by
+    propagation, while the other modes use the backtracking search order.
+    Arguments:
+        board: the 9x9 sudoku board.
+        validValues: the candidate masks of the unfilled positions.
+        searchMode: the mode how the next empty cell is found.
+    """
+    import backtracking as bk
+
+    if not bk.isMostConstrainedMode(searchMode):
+        return bk.findEmpty(board, searchMode)
+
+    fewest = min(spu.MASK_COUNT[vals] for vals in validValues.values())
+    cells = [pos for pos, vals in validValues.items() if spu.MASK_COUNT[vals] == fewest]
+
+    if searchMode==11:
+        return min(cells, key=lambda pos: (-sum(1 for peer in spu.PEERS[pos] if peer in validValues), pos))
+    elif searchMode==12:
+        import random
+        return random.choice(cells)
+
+    return min(cells)
+
+def searchWithPropagation(board: list[list[int]], validValues: dict[tuple[int, int], int], history: list[str] | None, stats: spu.SudokuStats | None, \
+                          searchMode: int, guessMode: int, state: spu.BoardState, trail: list[tuple[tuple[int, int], int, bool]], rules: list[str]) -> bool:
+    """
+    Guesses values, propagating each guess and undoing it through the trail when it leads to a contradiction.
+    Arguments:
+        board: the 9x9 sudoku board.
+        validValues: the candidate masks of the unfilled positions.
+        history: a history of solutions.
+        stats: The statistics object to record algorithm.
+        searchMode: the mode how the next empty cell is found.
+        guessMode: the mode how the next number is guessed.
+        state: the board state tracking the values in each row, column and box.
+        trail: the changes made so far.
+        rules: the names of the rules in RULES to apply besides singles.
+    """
+    import backtracking as bk
+
+    if not validValues:
+        return True
+
+    pos = findBranchCell(board, validValues, searchMode)
+    if __debug__ and stats is not None:
+        stats.findEmptyScans += 1
+    if pos is None:
+        return False
+
+    vals = bk.getGuesses(validValues[pos], guessMode)
+    if vals is None:
+        return False
+
+    for guess in vals:
+        if stats is not None:
+            stats.incrementGuesses()
+            if __debug__:
+                stats.registerBranch()
+                stats.descend()
+
+        mark = len(trail)
+        queue = PropagationQueue()
+        solved = assign(board, validValues, history, state, trail, pos, guess, queue, stats) and applyRules(board, validValues, history, stats, state, trail, queue, rules) \
+                and searchWithPropagation(board, validValues, history, stats, searchMode, guessMode, state, trail, rules)
+        if __debug__ and stats is not None:
+            stats.ascend()
+        if solved:
+            return True
+
+        undo(board, validValues, history, state, trail, mark)
+
+        if stats is not None:
+            stats.incrementBacktracks()
+
+    return False
+
+def solveWithPropagation(board: list[list[int]], validValues: dict[tuple[int,int], int], history: list[str] | None, stats: spu.SudokuStats | None, searchMode: int, guessMode: int, \
+                         rules: list[str] | None = None) -> bool:
+    """
+    Solves a sudoku puzzle by guessing values and applying naked singles, lone rangers and the other rules after
+    every guess. Eliminations are recorded in a trail and undone on backtrack instead of copying the valid values.
+    Arguments:
+        board: the 9x9 puzzle to be solved.
+        validValues: the candidate mask of possible values for each unsolved cell.
+        history: a list containing a history of solutions for tracking.
+        stats: The statistics object to record algorithm.
+        searchMode: the mode how the next empty cell is found.
+        guessMode: the mode how the next number is guessed.
+        rules: the names of the rules in RULES to apply besides singles, all when None.
+    """
+    state = spu.BoardState(board)
+    trail = list[tuple[tuple[int, int], int, bool]]()
+    rules = list(RULES) if rules is None else rules
+
+    if not applyRules(board, validValues, history, stats, state, trail, PropagationQueue.full(validValues), rules):
+        return False
+
+    return searchWithPropagation(board, validValues, history, stats, searchMode, guessMode, state, trail, rules)
@@ -0,0 +1,99 @@
+"""
+Solver metrics
+
+Date: 17/10/2026
+
+Prometheus metrics of a solver run: puzzles solved and failed, solve latency, guesses and backtracks per puzzle,
+the number of puzzles queued for the solver and the time the last puzzle completed. The metrics are served on
+a local HTTP endpoint, written to a file for the node exporter textfile collector, or both.
+"""
+import time
+import prometheus_client as prom
+
+# Bucket bounds of the solve latency in seconds, and of the guesses and backtracks of a puzzle
+LATENCY_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 100000)
+
+class SolverMetrics:
+    """
+    The metrics of one solver run, labelled by algorithm, search mode and guess mode.
+    """
+    def __init__(self, alg: str, searchMode: int, guessMode: int, port: int | None = None, fileName: str | None = None, \
+                 writeInterval: float = 5.0):
+        """
+        Creates the metrics and starts serving them.
+        Arguments:
+            alg: the name of the algorithm.
+            searchMode: defines how missing values are searched.
+            guessMode: defines how guesses are made.
+            port: the local port serving the metrics over HTTP, None for no endpoint.
+            fileName: the textfile collector file where the metrics are written, None for no file.
+            writeInterval: the minimum seconds between writes of the metrics file.
+        """
+        self.registry = prom.CollectorRegistry()
+        self.fileName = fileName
+        self.writeInterval = writeInterval
+        self.lastWrite = time.monotonic()
+
+        labels = ("algorithm", "search", "guess")
+        values = (alg, str(searchMode), str(guessMode))
+
+        self.solved = prom.Counter("sudoku_puzzles_solved", "Puzzles solved.", labels, registry=self.registry).labels(*values)
+        self.failed = prom.Counter("sudoku_puzzles_failed", "Puzzles which raised an error.", labels, registry=self.registry).labels(*values)
+        self.latency = prom.Histogram("sudoku_solve_seconds", "Median solve time of a puzzle.", labels, \
+            buckets=LATENCY_BUCKETS, registry=self.registry).labels(*values)
+        self.guesses = prom.Histogram("sudoku_puzzle_guesses", "Guesses made solving a puzzle.", labels, \
+            buckets=COUNT_BUCKETS, registry=self.registry).labels(*values)
+        self.backtracks = prom.Histogram("sudoku_puzzle_backtracks", "Backtracks made solving a puzzle.", labels, \
+            buckets=COUNT_BUCKETS, registry=self.registry).labels(*values)
+        self.queueDepth = prom.Gauge("sudoku_queue_depth", "Puzzles read and handed to the solver but not completed.", labels, \
+            registry=self.registry).labels(*values)
+        self.lastCompleted = prom.Gauge("sudoku_last_completed_timestamp_seconds", "Time the last puzzle was completed.", labels, \
+            registry=self.registry).labels(*values)
+
+        if port is not None:
+            prom.start_http_server(port, registry=self.registry)
+
+    def observeSolved(self, executionTime: float, guesses: int, backtracks: int, queueDepth: int):
+        """
+        Records a solved puzzle.
+        Arguments:
+            executionTime: the solve time of the puzzle in seconds.
+            guesses: the guesses made solving the puzzle.
+            backtracks: the backtracks made solving the puzzle.
+            queueDepth: the puzzles still queued for the solver.
+        """
+        self.solved.inc()
+        self.latency.observe(executionTime)
+        self.guesses.observe(guesses)
+        self.backtracks.observe(backtracks)
+        self.completed(queueDepth)
+
+    def observeFailed(self, queueDepth: int):
+        """
+        Records a puzzle which raised an error.
+        Arguments:
+            queueDepth: the puzzles still queued for the solver.
+        """
+        self.failed.inc()
+        self.completed(queueDepth)
+
+    def completed(self, queueDepth: int):
+        """
+        Records the completion of a puzzle and writes the metrics file when it is due.
+        Arguments:
+            queueDepth: the puzzles still queued for the solver.
+        """
+        self.queueDepth.set(queueDepth)
+        self.lastCompleted.set_to_current_time()
+
+        if self.fileName is not None and time.monotonic() - self.lastWrite >= self.writeInterval:
+            self.write()
+
+    def write(self):
+        """
+        Writes the metrics file, if any.
+        """
+        if self.fileName is not None:
+            prom.write_to_textfile(self.fileName, self.registry)
+        self.lastWrite = time.monotonic()
@@ -9,6 +9,7 @@ A sudoku puzzle generator.
 import tqdm
 import random
 import sudokuPuzzleUtils as spu
+import sudokuIO as sio
 import backtracking as solver
 
 def generatePuzzles(count: int, minZeros: int, maxZeros:int, fileName: str):
@@ -18,9 +19,9 @@ def generatePuzzles(count: int, minZeros: int, maxZeros:int, fileName: str):
         count: the number of puzzles to generate.
         minZeros: the minimum number of zeros desired in each puzzle.
         maxZeros: the maximum number of zeros desired in each puzzle.
-        fileName: the file name where to save the puzzles
+        fileName: the file name where to save the puzzles, compressed when its extension is .gz, .bz2 or .xz.
     """ 
-    with open(fileName, "w", encoding="utf-8") as f:
+    with sio.openStream(fileName, "w") as f:
         print("Generating balanced dataset of {:0.0f} puzzles with {:0.0f} to {:0.0f} zeros.".format(count*(maxZeros+1-minZeros), minZeros, maxZeros))
 
         puzzles = set()
@@ -33,7 +34,7 @@ def generatePuzzles(count: int, minZeros: int, maxZeros:int, fileName: str):
 
                 # Solve puzzle
                 validValues = spu.cacheValidValues(board=board)
-                solver.backtracking(board=board, validValues=validValues, history=None, stats=None, searchMode=9, guessMode=2)
+                solver.solve(board=board, validValues=validValues, history=None, stats=None, searchMode=9, guessMode=2)
 
                 # Remove digits
                 changed = 0
@@ -0,0 +1,306 @@
+"""
+Sudoku input and output streams
+
+Date: 17/10/2026
+
+Streams used by the solvers to read puzzles and write their results.
+"""
+import io
+import json
+import os
+import time
+import itertools
+import contextlib
+import sudokuPuzzleUtils as spu
+
+# Codec module of each compressed file extension
+CODECS = {".gz": "gzip", ".bz2": "bz2", ".xz": "lzma", ".lzma": "lzma"}
+
+# Bytes read from a file at a time
+READ_BUFFER_SIZE = 1 << 20
+
+def getCodec(fileName: str):
+    """
+    Gets the codec module of a compressed file from its extension, None if the file is not compressed.
+    Arguments:
+        fileName: the file name.
+    """
+    import importlib
+
+    extension = os.path.splitext(fileName)[1].lower()
+    return importlib.import_module(CODECS[extension]) if extension in CODECS else None
+
+def isCompressed(fileName: str) -> bool:
+    """
+    Checks if a file is compressed, by its extension.
+    Arguments:
+        fileName: the file name.
+    """
+    return getCodec(fileName) is not None
+
+def openBinary(fileName: str, mode: str = "rb"):
+    """
+    Opens a file in binary mode, compressing or decompressing it when its extension names a codec. Reads go
+    through a large buffer.
+    Arguments:
+        fileName: the file name.
+        mode: the binary mode the file is opened with.
+    """
+    codec = getCodec(fileName)
+    if codec is None:
+        return open(fileName, mode, buffering=READ_BUFFER_SIZE)
+
+    f = codec.open(fileName, mode)
+    return io.BufferedReader(f, READ_BUFFER_SIZE) if "r" in mode else f
+
+def openStream(fileName: str, mode: str = "r"):
+    """
+    Opens a file in text mode, compressing or decompressing it when its extension names a codec. Reads go
+    through a large buffer.
+    Arguments:
+        fileName: the file name.
+        mode: the text mode the file is opened with.
+    """
+    if "r" in mode:
+        return io.TextIOWrapper(openBinary(fileName, "rb"), encoding="utf-8")
+
+    codec = getCodec(fileName)
+    if codec is None:
+        return open(fileName, mode, encoding="utf-8")
+
+    return codec.open(fileName, mode + "t", encoding="utf-8")
+
+# Input formats: one 81 digit puzzle per line, id, puzzle and solution rows separated by commas, or packed puzzles
+FORMAT_PUZZLES = "puzzles"
+FORMAT_CSV = "csv"
+FORMAT_PACKED = "packed"
+
+# Number of solutions checked at once
+VERIFY_BATCH_SIZE = 4096
+
+def detectFormat(fileName: str) -> tuple[str, int]:
+    """
+    Detects the format of a puzzles file from its first line. Returns the format and the number of header lines
+    to skip.
+    Arguments:
+        fileName: the file name of the puzzles.
+    """
+    import sudokuPacked
+
+    if sudokuPacked.isPacked(fileName):
+        return FORMAT_PACKED, 0
+
+    with openStream(fileName) as f:
+        line = f.readline()
+
+    if "," not in line:
+        return FORMAT_PUZZLES, 0
+
+    # A header row has no puzzle in its second field
+    puzzle = line.partition(",")[2].partition(",")[0].strip()
+    return FORMAT_CSV, 0 if len(puzzle) == 81 and puzzle.isdigit() else 1
+
+def readPuzzles(lines, inputFormat: str):
+    """
+    Reads the puzzles of a stream of lines. Yields each puzzle and its reference solution, None if the format
+    has no solutions.
+    Arguments:
+        lines: the lines to read.
+        inputFormat: the format of the lines, FORMAT_PUZZLES or FORMAT_CSV.
+    """
+    if inputFormat == FORMAT_PUZZLES:
+        for line in lines:
+            yield line.strip(), None
+    elif inputFormat == FORMAT_CSV:
+        for line in lines:
+            # Skip the id, then split the puzzle from the solution
+            puzzle, sep, solution = line.partition(",")[2].partition(",")
+            yield puzzle.strip(), solution.strip() or None
+    else: raise ValueError("Unrecognized input format: {}\n".format(inputFormat))
+
+def getPuzzleCount(fileName: str) -> int:
+    """
+    Gets the number of puzzles in a puzzles file of any format.
+    Arguments:
+        fileName: the file name of the puzzles.
+    """
+    import sudokuPacked
+
+    inputFormat, headerLines = detectFormat(fileName)
+    if inputFormat == FORMAT_PACKED:
+        with sudokuPacked.PackedReader(fileName) as reader:
+            return len(reader)
+
+    return spu.getFileLineCount(fileName) - headerLines
+
+@contextlib.contextmanager
+def openPuzzles(fileName: str, start: int = 0, stop: int | None = None):
+    """
+    Opens a puzzles file of any format, compressed or not, and gives the stream of its puzzles and their reference
+    solutions, None if the format has no solutions. Text files are entered at the start puzzle through their line
+    index.
+    Arguments:
+        fileName: the file name of the puzzles.
+        start: the number of the first puzzle to read.
+        stop: the number of the puzzle after the last one to read, up to the end when None.
+    """
+    import sudokuPacked
+
+    inputFormat, headerLines = detectFormat(fileName)
+    if inputFormat == FORMAT_PACKED:
+        with sudokuPacked.PackedReader(fileName) as reader:
+            yield ((puzzle, None) for puzzle in reader.iterPuzzles(start, stop))
+        return
+
+    if stop is not None and stop <= start:
+        yield iter(())
+        return
+
+    with openStream(fileName) as f:
+        f.seek(spu.getLineOffset(fileName, headerLines + start))
+        yield readPuzzles(f if stop is None else itertools.islice(f, stop - start), inputFormat)
+
+def verifySolutions(puzzles: list[str], solutions: list[str], references: list[str | None], unique: bool = False) -> tuple[list[int], list[int]]:
+    """
+    Checks solutions all at once. A solution is valid when every row, column and box holds the digits 1 to 9 and
+    the clues of its puzzle are kept. Returns the indices of the solutions which are not valid, and of the valid
+    solutions which differ from their reference solution. Puzzles may have more than one solution, so the
+    references are only compared when the puzzles are known to have a unique solution.
+    Arguments:
+        puzzles: the puzzles in 81 digit string format.
+        solutions: the solutions in 81 digit string format, in the same order.
+        references: the reference solutions in the same order, None where there is none.
+        unique: whether every puzzle is known to have a unique solution.
+    """
+    import numpy as np
+    import batchSolver as bs
+
+    if not solutions:
+        return list[int](), list[int]()
+
+    # Anything malformed is checked as an empty grid, and anything but a digit as an empty cell
+    def toGrids(values: list[str]) -> np.ndarray:
+        data = np.frombuffer("".join(value if len(value) == 81 else "0" * 81 for value in values).encode("ascii"), dtype=np.uint8) - ord("0")
+        return np.where(data > 9, 0, data).reshape(-1, 81)
+
+    grids = toGrids(solutions)
+    clues = toGrids(puzzles)
+    valid = bs.isSolved(grids) & ((clues == 0) | (clues == grids)).all(axis=1)
+    invalid = np.nonzero(~valid)[0].tolist()
+
+    if not unique:
+        return invalid, list[int]()
+
+    differ = [i for i in np.nonzero(valid)[0].tolist() if references[i] is not None and solutions[i] != references[i]]
+    return invalid, differ
+
+class RecordWriter:
+    """
+    Keeps an output file open for a whole run and writes its records in batches. Records are buffered until
+    a number of them is reached or some time has passed since the last write, and whatever is left is written
+    when the writer is closed, also when a run ends with an error.
+    """
+    def __init__(self, fileName: str, mode: str = "a", header: str | None = None, flushRecords: int = 1024, flushInterval: float = 5.0):
+        """
+        Opens an output file.
+        Arguments:
+            fileName: the file name to write to, compressed when its extension names a codec.
+            mode: the mode the file is opened with, "a" to append or "w" to overwrite.
+            header: a line written first, if any.
+            flushRecords: the number of buffered records which are written at once.
+            flushInterval: the maximum seconds records stay buffered while more are written.
+        """
+        self.file = openStream(fileName, mode)
+        self.records = list[str]()
+        self.flushRecords = flushRecords
+        self.flushInterval = flushInterval
+        self.lastFlush = time.monotonic()
+
+        if header is not None:
+            self.write(header)
+
+    def write(self, record: str):
+        """
+        Adds a line to the file.
+        Arguments:
+            record: the line to write, without its newline.
+        """
+        self.records.append(record)
+
+        if len(self.records) >= self.flushRecords or time.monotonic() - self.lastFlush >= self.flushInterval:
+            self.flush()
+
+    def writeAll(self, records: list[str]):
+        """
+        Adds a number of lines to the file.
+        Arguments:
+            records: the lines to write, without their newlines.
+        """
+        self.records.extend(records)
+
+        if len(self.records) >= self.flushRecords or time.monotonic() - self.lastFlush >= self.flushInterval:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered records to the file.
+        """
+        if self.records:
+            self.records.append("")
+            self.file.write("\n".join(self.records))
+            self.records.clear()
+
+        self.file.flush()
+        self.lastFlush = time.monotonic()
+
+    def getPosition(self) -> int:
+        """
+        Writes the buffered records and gets the size of the file written so far.
+        """
+        self.flush()
+        return self.file.tell()
+
+    def close(self):
+        """
+        Writes the buffered records and closes the file.
+        """
+        if self.file.closed:
+            return
+
+        try:
+            self.flush()
+        finally:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+def saveCheckpoint(fileName: str, checkpoint: dict):
+    """
+    Saves the progress of a run. The file is replaced at once, so an interrupted save leaves the previous
+    checkpoint in place.
+    Arguments:
+        fileName: the checkpoint file name.
+        checkpoint: the progress of the run.
+    """
+    with open(fileName + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(fileName + ".tmp", fileName)
+
+def loadCheckpoint(fileName: str) -> dict | None:
+    """
+    Loads the progress of a run, None if no checkpoint was saved.
+    Arguments:
+        fileName: the checkpoint file name.
+    """
+    if not os.path.exists(fileName):
+        return None
+
+    with open(fileName, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,238 @@
+"""
+Packed sudoku puzzle format
+
+Date: 17/10/2026
+
+Stores puzzles with 4 bits per cell, two cells to a byte with the first cell in the high nibble, so every
+puzzle takes a fixed 41 byte record. The records follow an 8 byte header of the format magic and version. The
+file is read through a memory map, so any puzzle is found in constant time and the records can be viewed as a
+NumPy array without copying.
+"""
+import mmap
+import struct
+import numpy as np
+
+# File header: format magic and version
+HEADER = struct.Struct("<4sI")
+MAGIC = b"SDKP"
+VERSION = 1
+
+# Bytes per packed puzzle
+RECORD_SIZE = 41
+
+def pack(puzzle: str) -> bytes:
+    """
+    Packs a puzzle into a record.
+    Arguments:
+        puzzle: the puzzle in 81 digit string format.
+    """
+    return packArray(np.frombuffer(puzzle.encode("ascii"), dtype=np.uint8).reshape(1, 81) - ord("0")).tobytes()
+
+def unpack(record: bytes) -> str:
+    """
+    Unpacks a record into a puzzle.
+    Arguments:
+        record: the packed puzzle.
+    """
+    return (unpackArray(np.frombuffer(record, dtype=np.uint8).reshape(1, RECORD_SIZE))[0] + ord("0")).tobytes().decode("ascii")
+
+def packArray(grids: np.ndarray) -> np.ndarray:
+    """
+    Packs an (N, 81) array of puzzles into an (N, 41) array of records.
+    Arguments:
+        grids: the puzzles array, one unsigned digit per cell.
+    """
+    if grids.size and grids.max() > 9:
+        raise ValueError("Puzzles can only hold the digits 0 to 9\n")
+
+    cells = np.zeros((len(grids), RECORD_SIZE * 2), dtype=np.uint8)
+    cells[:, :81] = grids
+    return (cells[:, 0::2] << 4) | cells[:, 1::2]
+
+def unpackArray(records: np.ndarray) -> np.ndarray:
+    """
+    Unpacks an (N, 41) array of records into an (N, 81) array of puzzles.
+    Arguments:
+        records: the packed puzzles.
+    """
+    cells = np.empty((len(records), RECORD_SIZE * 2), dtype=np.uint8)
+    cells[:, 0::2] = records >> 4
+    cells[:, 1::2] = records & 0x0F
+    return cells[:, :81]
+
+def isPacked(fileName: str) -> bool:
+    """
+    Checks if a file is in the packed format.
+    Arguments:
+        fileName: the file name to check.
+    """
+    with open(fileName, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+class PackedReader:
+    """
+    Reads a packed puzzles file through a memory map.
+    """
+    def __init__(self, fileName: str):
+        """
+        Opens a packed puzzles file.
+        Arguments:
+            fileName: the file name of the packed puzzles.
+        """
+        self.file = open(fileName, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("{} is not a packed puzzles file of version {}\n".format(fileName, VERSION))
+
+        self.count = (len(self.map) - HEADER.size) // RECORD_SIZE
+
+        # All records as one array sharing the memory of the map
+        self.records = np.frombuffer(self.map, dtype=np.uint8, count=self.count * RECORD_SIZE, offset=HEADER.size).reshape(self.count, RECORD_SIZE)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> str:
+        """
+        Gets a puzzle in 81 digit string format.
+        Arguments:
+            i: the puzzle number.
+        """
+        return (unpackArray(self.records[i:i+1])[0] + ord("0")).tobytes().decode("ascii")
+
+    def getBoard(self, i: int) -> list[list[int]]:
+        """
+        Gets a puzzle as a 2D 9x9 array.
+        Arguments:
+            i: the puzzle number.
+        """
+        return unpackArray(self.records[i:i+1])[0].reshape(9, 9).tolist()
+
+    def getGrids(self, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """
+        Gets a range of puzzles as an (N, 81) array.
+        Arguments:
+            start: the first puzzle number.
+            stop: the puzzle number after the last, up to the end when None.
+        """
+        return unpackArray(self.records[start:stop])
+
+    def iterPuzzles(self, start: int = 0, stop: int | None = None, batchSize: int = 4096):
+        """
+        Yields a range of puzzles in 81 digit string format, unpacking them in batches.
+        Arguments:
+            start: the first puzzle number.
+            stop: the puzzle number after the last, up to the end when None.
+            batchSize: the number of puzzles unpacked at once.
+        """
+        stop = self.count if stop is None else min(stop, self.count)
+        for i in range(start, stop, batchSize):
+            data = (self.getGrids(i, min(i + batchSize, stop)) + ord("0")).tobytes().decode("ascii")
+            for j in range(0, len(data), 81):
+                yield data[j:j+81]
+
+    def close(self):
+        """
+        Closes the memory map and the file. A map still viewed by an array taken from records stays open
+        until that array is released.
+        """
+        self.records = None
+        try:
+            self.map.close()
+        except BufferError:
+            # Leave the map to be closed by the GC once no array views it
+            pass
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+def writePacked(fileName: str, puzzles, batchSize: int = 4096) -> int:
+    """
+    Writes puzzles to a packed puzzles file. Returns the number of puzzles written.
+    Arguments:
+        fileName: the file name of the packed puzzles.
+        puzzles: the puzzles in 81 digit string format.
+        batchSize: the number of puzzles packed at once.
+    """
+    import itertools
+
+    count = 0
+    puzzles = iter(puzzles)
+    with open(fileName, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION))
+
+        while True:
+            batch = list(itertools.islice(puzzles, batchSize))
+            if not batch:
+                break
+
+            if any(len(puzzle) != 81 for puzzle in batch):
+                raise ValueError("Puzzles must have 81 digits\n")
+            grids = np.frombuffer("".join(batch).encode("ascii"), dtype=np.uint8).reshape(-1, 81) - ord("0")
+            f.write(packArray(grids).tobytes())
+            count += len(batch)
+
+    return count
+
+def toPacked(textFileName: str, packedFileName: str, solutionsFileName: str | None = None) -> int:
+    """
+    Converts a puzzles text file to the packed format. Returns the number of puzzles converted.
+    Arguments:
+        textFileName: the file name of the puzzles, either one puzzle per line or id, puzzle, solution rows.
+        packedFileName: the file name of the packed puzzles.
+        solutionsFileName: the file name of the packed reference solutions of id, puzzle, solution rows, if wanted.
+    """
+    import sudokuIO as sio
+
+    if solutionsFileName is not None:
+        if sio.detectFormat(textFileName)[0] != sio.FORMAT_CSV:
+            raise ValueError("{} has no reference solutions to pack\n".format(textFileName))
+
+        with sio.openPuzzles(textFileName) as rows:
+            writePacked(solutionsFileName, (solution for puzzle, solution in rows))
+
+    with sio.openPuzzles(textFileName) as rows:
+        return writePacked(packedFileName, (puzzle for puzzle, solution in rows))
+
+def toText(packedFileName: str, textFileName: str) -> int:
+    """
+    Converts a packed puzzles file to one puzzle per line. Returns the number of puzzles converted.
+    Arguments:
+        packedFileName: the file name of the packed puzzles.
+        textFileName: the file name where to write the puzzles.
+    """
+    import sudokuIO as sio
+
+    with PackedReader(packedFileName) as reader, sio.openStream(textFileName, "w") as f:
+        for puzzle in reader.iterPuzzles():
+            f.write("{}\n".format(puzzle))
+
+        return len(reader)
+
+def main():
+    import argparse
+
+    # Register arguments
+    parser = argparse.ArgumentParser();
+    parser.add_argument("mode", help="pack to convert a text file to the packed format; unpack to convert a packed file to text.", type=str, choices=["pack", "unpack"])
+    parser.add_argument("inputFileName", help="The file name to convert.", type=str)
+    parser.add_argument("outputFileName", help="The file name where to save the converted puzzles.", type=str)
+    parser.add_argument("--solutions", help="When packing id, puzzle, solution rows, the file name where to save the packed solutions.", type=str, default=None)
+
+    args = parser.parse_args()
+
+    if args.mode == "pack":
+        count = toPacked(args.inputFileName, args.outputFileName, args.solutions)
+    else: count = toText(args.inputFileName, args.outputFileName)
+
+    print("Converted {:0.0f} puzzles to {}".format(count, args.outputFileName))
+
+if (__name__=="__main__"):
+    main()
@@ -5,13 +5,72 @@ Author: Frankie Inguanez
 Date: 13/01/2023
 
 A series of utility functions to clean and check a sudoku puzzle.
+
+Candidates are represented as 9-bit integer masks where bit (n-1) is set when
+the digit n is still possible, so unit occupancy and candidate checks reduce
+to bitwise operations.
 """
+import array
+import struct
+
+# Mask with all nine digits set
+ALL_DIGITS = 0x1FF
+
+# Bit for each digit, indexed by the digit itself (index 0 is unused)
+DIGIT_MASK = (0,) + tuple(1 << (n - 1) for n in range(1, 10))
+
+# Digits and number of digits represented by each of the 512 possible masks
+MASK_VALUES = tuple(tuple(n for n in range(1, 10) if mask & (1 << (n - 1))) for mask in range(ALL_DIGITS + 1))
+MASK_COUNT = tuple(len(values) for values in MASK_VALUES)
+
+# All cells of the board in row order
+CELLS = tuple((row, col) for row in range(9) for col in range(9))
+
+# Box identification number of each cell
+BOX_OF = {(row, col): (row//3)*3 + col//3 for row, col in CELLS}
+
+# Positions of each row, column and box, in row order
+ROW_POSITIONS = tuple(tuple((row, col) for col in range(9)) for row in range(9))
+COL_POSITIONS = tuple(tuple((row, col) for row in range(9)) for col in range(9))
+BOX_POSITIONS = tuple(tuple(pos for pos in CELLS if BOX_OF[pos] == box) for box in range(9))
+BOX_POSITION_SETS = tuple(frozenset(positions) for positions in BOX_POSITIONS)
+
+# The 27 units: rows 0-8, columns 9-17 and boxes 18-26
+UNITS = ROW_POSITIONS + COL_POSITIONS + BOX_POSITIONS
+
+# Indices in UNITS of the row, column and box of each cell
+UNITS_OF = {(row, col): (row, 9 + col, 18 + BOX_OF[(row, col)]) for row, col in CELLS}
+
+# The 20 cells sharing a row, column or box with each cell
+PEERS = {pos: tuple(sorted(set(UNITS[UNITS_OF[pos][0]] + UNITS[UNITS_OF[pos][1]] + UNITS[UNITS_OF[pos][2]]) - {pos})) for pos in CELLS}
+
 class SudokuStats:
+    """
+    Statistics of solving a puzzle. Besides guesses and backtracks, the solvers count the hot path of the search
+    in plain integer fields: candidate checks (isValidCalls), searches for the next cell (findEmptyScans),
+    candidates eliminated from peers, rounds of each propagation rule, the deepest guess and the guesses made
+    at each depth. These counters are updated under __debug__, so running Python with -O compiles them out.
+    """
+    __slots__ = ("guesses", "backtracks", "executionTime", "executionTimeMin", "executionTimeP95", "unknowns", \
+                 "ruleApplications", "ruleEliminations", "isValidCalls", "findEmptyScans", "eliminations", \
+                 "propagationRounds", "depth", "maxDepth", "branching")
+
     def __init__(self):
         self.guesses = 0
         self.backtracks = 0
         self.executionTime = None
+        self.executionTimeMin = None
+        self.executionTimeP95 = None
         self.unknowns = 0
+        self.ruleApplications = dict[str, int]()
+        self.ruleEliminations = dict[str, int]()
+        self.isValidCalls = 0
+        self.findEmptyScans = 0
+        self.eliminations = 0
+        self.propagationRounds = dict[str, int]()
+        self.depth = 0
+        self.maxDepth = 0
+        self.branching = list[int]()
 
     def incrementGuesses(self):
         self.guesses += 1
@@ -19,39 +78,249 @@ class SudokuStats:
     def incrementBacktracks(self):
         self.backtracks += 1
 
+    def incrementRule(self, rule: str, eliminations: int):
+        self.ruleApplications[rule] = self.ruleApplications.get(rule, 0) + 1
+        self.ruleEliminations[rule] = self.ruleEliminations.get(rule, 0) + eliminations
+
+    def incrementRound(self, rule: str):
+        self.propagationRounds[rule] = self.propagationRounds.get(rule, 0) + 1
+
+    def registerBranch(self):
+        """
+        Counts a guess at the current depth.
+        """
+        if len(self.branching) <= self.depth:
+            self.branching.extend([0] * (self.depth + 1 - len(self.branching)))
+        self.branching[self.depth] += 1
+
+    def descend(self):
+        """
+        Moves one guess deeper.
+        """
+        self.depth += 1
+        if self.depth > self.maxDepth:
+            self.maxDepth = self.depth
+
+    def ascend(self):
+        """
+        Moves one guess back.
+        """
+        self.depth -= 1
+
+    def merge(self, other: "SudokuStats"):
+        """
+        Adds the counters of another statistics object, such as one returned by a worker process. Execution
+        times are not merged.
+        Arguments:
+            other: the statistics to add.
+        """
+        self.guesses += other.guesses
+        self.backtracks += other.backtracks
+        self.unknowns += other.unknowns
+        self.isValidCalls += other.isValidCalls
+        self.findEmptyScans += other.findEmptyScans
+        self.eliminations += other.eliminations
+        self.maxDepth = max(self.maxDepth, other.maxDepth)
+
+        for counts, otherCounts in ((self.ruleApplications, other.ruleApplications), (self.ruleEliminations, other.ruleEliminations), \
+                                    (self.propagationRounds, other.propagationRounds)):
+            for key, count in otherCounts.items():
+                counts[key] = counts.get(key, 0) + count
+
+        if len(self.branching) < len(other.branching):
+            self.branching.extend([0] * (len(other.branching) - len(self.branching)))
+        for depth, count in enumerate(other.branching):
+            self.branching[depth] += count
+
+    def getDetailColumns(self) -> list[str]:
+        """
+        Gets the hot path counters as stats file columns: candidate checks, cell searches, eliminations, the
+        deepest guess, rounds per rule as rule:count pairs and guesses per depth, separated by semicolons.
+        """
+        return [str(self.isValidCalls), str(self.findEmptyScans), str(self.eliminations), str(self.maxDepth), \
+                ";".join("{}:{}".format(rule, count) for rule, count in self.propagationRounds.items()), \
+                ";".join(map(str, self.branching))]
+
     def registerExecutionTime(self, executionTime):
         self.executionTime=executionTime
 
+    def registerExecutionTimes(self, minimum: float, median: float, p95: float):
+        self.executionTimeMin=minimum
+        self.executionTime=median
+        self.executionTimeP95=p95
+
     def setUnknowns(self, zeros:int):
         self.unknowns=zeros
 
-def getFileLineCount(fileName: str) -> int:
+# Stats file columns of SudokuStats.getDetailColumns
+STATS_DETAIL_COLUMNS = ["Is Valid Calls", "Find Empty Scans", "Eliminations", "Max Depth", "Propagation Rounds", "Branching"]
+
+class BoardState:
     """
-    Get number of lines in a file.
+    A 9x9 board together with the masks of the digits used in each row, column and box. The masks are kept in
+    sync as values are placed and removed, so checking a value needs no scanning of the board.
+    """
+    def __init__(self, board: list[list[int]]):
+        self.board = board
+        self.rows, self.cols, self.boxes = getOccupancyMasks(board)
+
+    def getUsed(self, pos: tuple[int, int]) -> int:
+        """
+        Gets the mask of digits used in the row, column and box of a position.
+        Arguments:
+            pos: the row and column position.
+        """
+        row, col = pos
+        return self.rows[row] | self.cols[col] | self.boxes[BOX_OF[pos]]
+
+    def isValid(self, num: int, pos: tuple[int, int]) -> bool:
+        """
+        Checks if a number can be added to an empty position.
+        Arguments:
+            num: the number to insert.
+            pos: the row and column position to place the digit.
+        """
+        return not self.getUsed(pos) & DIGIT_MASK[num]
+
+    def place(self, pos: tuple[int, int], val: int):
+        """
+        Places a value in an empty position.
+        Arguments:
+            pos: the row and column position.
+            val: the value to place.
+        """
+        row, col = pos
+        bit = DIGIT_MASK[val]
+        self.board[row][col] = val
+        self.rows[row] |= bit
+        self.cols[col] |= bit
+        self.boxes[BOX_OF[pos]] |= bit
+
+    def unplace(self, pos: tuple[int, int]) -> int:
+        """
+        Clears a position and returns the value it held.
+        Arguments:
+            pos: the row and column position.
+        """
+        row, col = pos
+        val = self.board[row][col]
+        bit = ~DIGIT_MASK[val]
+        self.board[row][col] = 0
+        self.rows[row] &= bit
+        self.cols[col] &= bit
+        self.boxes[BOX_OF[pos]] &= bit
+
+        return val
+
+# Sidecar line index: header of magic, indexed file size, modification time and line count, then line offsets
+LINE_INDEX_SUFFIX = ".idx"
+LINE_INDEX_HEADER = struct.Struct("<4sQQQ")
+LINE_INDEX_MAGIC = b"SLX1"
+
+def buildLineIndex(fileName: str) -> array.array:
+    """
+    Scans a file and gets the byte offset where each line starts. Compressed files are scanned decompressed.
+    Arguments:
+        fileName: the name of the file to process.
+    """
+    import sudokuIO as sio
+
+    offsets = array.array("Q")
+    pos = 0
+    last = b"\n"
+
+    with sio.openBinary(fileName) as f:
+        while True:
+            block = f.read(1 << 20)
+            if not block:
+                break
+
+            # A line starts at the beginning of the file and after every newline
+            if last == b"\n":
+                offsets.append(pos)
+            i = block.find(b"\n")
+            while i != -1 and i + 1 < len(block):
+                offsets.append(pos + i + 1)
+                i = block.find(b"\n", i + 1)
+
+            last = block[-1:]
+            pos += len(block)
+
+    return offsets
+
+def getLineIndex(fileName: str) -> array.array:
+    """
+    Gets the byte offset where each line of a file starts, in the decompressed stream of a compressed file. The
+    offsets are kept in a sidecar index file which is reused until the size or modification time of the file
+    changes.
+    Arguments:
+        fileName: the name of the file to process.
+    """
+    import os
+
+    info = os.stat(fileName)
+    indexFileName = fileName + LINE_INDEX_SUFFIX
+
+    # Reuse the index if it was built from the current file
+    try:
+        with open(indexFileName, "rb") as f:
+            magic, size, mtime, count = LINE_INDEX_HEADER.unpack(f.read(LINE_INDEX_HEADER.size))
+            if magic == LINE_INDEX_MAGIC and size == info.st_size and mtime == info.st_mtime_ns:
+                offsets = array.array("Q")
+                offsets.frombytes(f.read(count * offsets.itemsize))
+                if len(offsets) == count:
+                    return offsets
+    except (OSError, struct.error):
+        pass
+
+    offsets = buildLineIndex(fileName)
+
+    # Save the index next to the file, replacing it at once so readers never see a partial index
+    try:
+        with open(indexFileName + ".tmp", "wb") as f:
+            f.write(LINE_INDEX_HEADER.pack(LINE_INDEX_MAGIC, info.st_size, info.st_mtime_ns, len(offsets)))
+            offsets.tofile(f)
+        os.replace(indexFileName + ".tmp", indexFileName)
+    except OSError:
+        # The directory is not writable, the index is rebuilt next time
+        pass
+
+    return offsets
+
+def getLineOffset(fileName: str, line: int) -> int:
+    """
+    Gets the byte offset where a line of a file starts, or the file size if the file has fewer lines.
     Arguments:
         fileName: the name of the file to process.
+        line: the zero based line number.
     """
-    import mmap
+    import os
 
-    lines = 0
-    with open(fileName, "r+", encoding="utf-8") as f:
-        bf = mmap.mmap(f.fileno(), 0)
+    offsets = getLineIndex(fileName)
+    if line < len(offsets):
+        return offsets[line]
 
-        while bf.readline():
-            lines += 1
+    return os.path.getsize(fileName)
 
-    return lines
+def getFileLineCount(fileName: str) -> int:
+    """
+    Get number of lines in a file.
+    Arguments:
+        fileName: the name of the file to process.
+    """
+    return len(getLineIndex(fileName))
     
-def saveError(error: Exception, errorsFileName: str):
+def saveError(error: Exception, errorsFileName: str, context: str | None = None):
     """
     Saves an error/exception that is raised.
     Arguments:
         error: the Exception that is raised.
         errorsFileName: the file name where the error will be saved.
+        context: what was being done when the error was raised, if known.
     """
     try:
         with open(errorsFileName, "a", encoding="utf-8") as ef:
-            ef.write("Encountered error:\n{}\n{}\n{}\n\n".format(type(error), error.args, error))
+            ef.write("Encountered error{}:\n{}\n{}\n{}\n\n".format("" if context is None else " in {}".format(context), type(error), error.args, error))
     except Exception as e:
         # Failed to save error to file
         print("Failed to save original error to file due to:\n{}\n{}\n{}\n\n".format(type(e), e.args, e))
@@ -85,11 +354,7 @@ def getColValues(puzzle: list[list[int]], col: int) -> list[int]:
         puzzle: a 2 dimensional array representing the 9x9 puzzle. 
         col: the column number.
     """
-    lst = list()
-    for row in puzzle:
-        lst.append(row[col])
-
-    return lst
+    return [row[col] for row in puzzle]
 
 def getBox(pos: tuple[int, int]) -> int:
     """
@@ -97,7 +362,7 @@ def getBox(pos: tuple[int, int]) -> int:
     Arguments:
         pos: the row and column position.
     """
-    return (pos[0]//3)*3+ pos[1]//3
+    return BOX_OF[pos]
 
 def getBoxValues(puzzle: list[list[int]], box: int) -> list[int]:
     """
@@ -109,29 +374,23 @@ def getBoxValues(puzzle: list[list[int]], box: int) -> list[int]:
         puzzle: a 2 dimensional array representing the 9x9 puzzle.
         box: the box identification number.
     """
-    return [puzzle[x][y] for x in range((box//3)*3,((box//3)*3)+3) for y in range((box%3)*3, ((box%3)*3)+3)]
+    return [puzzle[x][y] for x, y in BOX_POSITIONS[box]]
 
-def getBoxPositions(box: int) -> set[tuple[int,int]]:
+def getBoxPositions(box: int) -> frozenset[tuple[int,int]]:
     """
     Gets all positions of the same mini-grid box of the specified position.
     Arguments:
         box: the box number.
     """
-    positions = set[tuple[int, int]]()
-
-    for x in range((box//3)*3,((box//3)*3)+3):
-        for y in range((box%3)*3, ((box%3)*3)+3):
-            positions.add((x, y))
-
-    return positions
+    return BOX_POSITION_SETS[box]
 
-def getBoxPositionsByPos(pos: tuple[int,int]) -> set[tuple[int,int]]:
+def getBoxPositionsByPos(pos: tuple[int,int]) -> frozenset[tuple[int,int]]:
     """
     Gets all positions of the same mini-grid box of the specified position.
     Arguments:
         pos: the position of the cell within the puzzle board.
     """
-    return getBoxPositions(getBox(pos))
+    return BOX_POSITION_SETS[BOX_OF[pos]]
 
 def checkList(lst: list[int]) -> bool:
     """
@@ -164,67 +423,104 @@ def isSolved(puzzle: list[list[int]]) -> bool:
 
     return True
 
-def isValid(puzzle: list[list[int]], num: int, pos: tuple[int, int]) -> bool:
+def toMask(values) -> int:
+    """
+    Converts a collection of digits to a candidate mask.
+    Arguments:
+        values: the digits to include in the mask, zeros are ignored.
+    """
+    mask = 0
+    for n in values:
+        mask |= DIGIT_MASK[n]
+
+    return mask
+
+def maskToValues(mask: int) -> list[int]:
+    """
+    Converts a candidate mask to the list of digits it represents, in ascending order.
+    Arguments:
+        mask: the 9-bit candidate mask.
+    """
+    return list(MASK_VALUES[mask])
+
+def getOccupancyMasks(board: list[list[int]]) -> tuple[list[int], list[int], list[int]]:
+    """
+    Gets the masks of digits already placed in each row, column and box.
+    Arguments:
+        board: a 2 dimensional 9x9 sudoku puzzle.
+    """
+    rows = [0] * 9
+    cols = [0] * 9
+    boxes = [0] * 9
+
+    for row, col in CELLS:
+        bit = DIGIT_MASK[board[row][col]]
+        rows[row] |= bit
+        cols[col] |= bit
+        boxes[BOX_OF[(row, col)]] |= bit
+
+    return rows, cols, boxes
+
+def isValid(puzzle: list[list[int]], num: int, pos: tuple[int, int], state: BoardState | None = None) -> bool:
     """
-    Checks if a number can be added to a specific position
+    Checks if a number can be added to a specific position. Without a board state the peers of the position are
+    scanned, so checks made over and over should keep a BoardState of the puzzle.
     Arguments:
         puzzle: a 2 dimensional array representing the 9x9 puzzle.
         num: the number to insert.
         pos: the row and column position to place the digit.
+        state: the board state of the puzzle, if kept.
     """ 
-    # Check the row
-    for i in range(len(puzzle[0])):
-        if puzzle[pos[0]][i]==num and pos[1] != i:
-            return False
+    if state is not None:
+        return state.isValid(num, pos)
 
-    # Check the column
-    for i in range(len(puzzle[1])):
-        if puzzle[i][pos[1]]==num and pos[0] != i:
+    # Check the row, column and box
+    for x, y in PEERS[pos]:
+        if puzzle[x][y] == num:
             return False
 
-    # Check box
-    positions = getBoxPositionsByPos(pos)
-    for position in positions:
-        if puzzle[position[0]][position[1]] == num and position!=pos:
-            return False;
-
     return True
 
-def allowedValues(board: list[list[int]], pos: tuple[int, int]) -> list[int]:
+def allowedMask(board: list[list[int]], pos: tuple[int, int], state: BoardState | None = None) -> int:
     """
-    Gets all allowed values for a given position in a board.
+    Gets the candidate mask of allowed values for a given position in a board. Without a board state the peers
+    of the position are scanned, so masks needed over and over should come from a BoardState of the board.
     Arguments:
         board: a 2 dimensional 9x9 sudoku puzzle.
         pos: the row and column position.
+        state: the board state of the board, if kept.
     """
-    result = list()
-
-    for number in range(1,10):
-        nums = board[pos[0]]
-        if number in nums:
-            continue
+    if state is not None:
+        return ALL_DIGITS & ~state.getUsed(pos)
 
-        nums = getColValues(board, pos[1])
-        if number in nums:
-            continue
-        
-        nums = getBoxValues(board, getBox(pos))
-        if number in nums:
-            continue
+    used = 0
+    for x, y in PEERS[pos]:
+        used |= DIGIT_MASK[board[x][y]]
 
-        result.append(number)
+    return ALL_DIGITS & ~used
 
-    return result
+def allowedValues(board: list[list[int]], pos: tuple[int, int], state: BoardState | None = None) -> list[int]:
+    """
+    Gets all allowed values for a given position in a board.
+    Arguments:
+        board: a 2 dimensional 9x9 sudoku puzzle.
+        pos: the row and column position.
+        state: the board state of the board, if kept.
+    """
+    return maskToValues(allowedMask(board, pos, state))
 
-def cacheValidValues(board: list[list[int]]) -> dict:
+def cacheValidValues(board: list[list[int]]) -> dict[tuple[int, int], int]:
     """
-    Creates a cache of possible values for each cell in a board.
+    Creates a cache of possible values for each cell in a board. Each unfilled cell is
+    mapped to the candidate mask of its possible values.
     Arguments:
         board: a 2 dimensional array of a 9x9 sudoku board.
     """
+    rows, cols, boxes = getOccupancyMasks(board)
+
     cache = dict()
-    for i in range(9):
-        for j in range(9):
-            if board[i][j] == 0:
-                cache[(i,j)] = allowedValues(board,(i,j))
-    return cache
\ No newline at end of file
+    for pos in CELLS:
+        i, j = pos
+        if board[i][j] == 0:
+            cache[pos] = ALL_DIGITS & ~(rows[i] | cols[j] | boxes[BOX_OF[pos]])
+    return cache
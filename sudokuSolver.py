@@ -6,7 +6,10 @@ Date: 27/01/2023
 """
 import backtracking as bkSolver
 import rulebased as rbSolver
+import dancinglinks as dlSolver
 import sudokuPuzzleUtils as spu
+import benchmark as bm
+import sudokuIO as sio
 
 def getSearchAlg(searchMode: int) -> str:
     """
@@ -32,6 +35,12 @@ def getSearchAlg(searchMode: int) -> str:
         return "By mini-grid randomly"
     elif (searchMode==9):
         return "By box diagonal"
+    elif (searchMode==10):
+        return "Most constrained"
+    elif (searchMode==11):
+        return "Most constrained by degree"
+    elif (searchMode==12):
+        return "Most constrained randomly"
     else: return "Unknown" 
 
 def getGuessAlg(guessMode: int) -> str:
@@ -56,10 +65,124 @@ def getAlg(alg: int) -> str:
         return "Backtracking"
     elif alg==2:
         return "Rules"
+    elif alg==3:
+        return "Iterative"
+    elif alg==4:
+        return "DancingLinks"
+    elif alg==5:
+        return "Propagation"
     else: return "Unknown"
 
+def getSolver(alg: int, rules: list[str] | None = None):
+    """
+    Gets the solve function of an algorithm. All solve functions take the board, valid values, history,
+    statistics, search mode and guess mode.
+    Arguments:
+        alg: the algorithm identification number.
+        rules: the rules applied by the rule-based algorithms besides singles, the algorithm default when None.
+    """
+    import functools
+
+    if alg==1:
+        return bkSolver.solve
+    elif alg==2:
+        return functools.partial(rbSolver.solve, rules=rules)
+    elif alg==3:
+        return bkSolver.solveIterative
+    elif alg==4:
+        return dlSolver.solve
+    elif alg==5:
+        return functools.partial(rbSolver.solveWithPropagation, rules=rules)
+    else: raise ValueError("Unrecognized algorithm identifier: {}\n".format(alg))
+
+def getSearchModes(alg: int) -> list[int]:
+    """
+    Gets the search modes which change how an algorithm solves puzzles. Algorithms which choose their own
+    cells have the first search mode only.
+    Arguments:
+        alg: the algorithm identification number.
+    """
+    if alg==4:
+        return [1]
+    else: return list(range(1,13))
+
+def solvePuzzle(puzzle: str, solver, searchMode: int, guessMode: int, tracking: bool, warmup: int = 1, repeat: int = 5) \
+        -> tuple[str, list[str] | None, spu.SudokuStats]:
+    """
+    Solves a single puzzle. Returns the solution, the tracking history and the statistics.
+    Arguments:
+        puzzle: the puzzle in 81 digit string format.
+        solver: the solve function of the algorithm, as returned by getSolver.
+        searchMode: defines how missing values are searched.
+        guessMode: defines how guesses are made.
+        tracking: whether the history of solutions is kept.
+        warmup: the number of untimed runs before timing.
+        repeat: the number of timed runs.
+    """
+    board = spu.to2DArray(puzzle)
+    return solveBoard(board, spu.cacheValidValues(board), puzzle.count('0'), solver, searchMode, guessMode, tracking, warmup, repeat)
+
+def solveBoard(board: list[list[int]], validValues: dict[tuple[int, int], int], unknowns: int, solver, searchMode: int, guessMode: int, \
+               tracking: bool, warmup: int = 1, repeat: int = 5) -> tuple[str, list[str] | None, spu.SudokuStats]:
+    """
+    Solves a parsed puzzle, filling the board and valid values in place. Returns the solution, the tracking history
+    and the statistics.
+    Arguments:
+        board: the 9x9 puzzle to be solved.
+        validValues: the candidate mask for each unsolved cell.
+        unknowns: the number of empty cells of the puzzle.
+        solver: the solve function of the algorithm, as returned by getSolver.
+        searchMode: defines how missing values are searched.
+        guessMode: defines how guesses are made.
+        tracking: whether the history of solutions is kept.
+        warmup: the number of untimed runs before timing.
+        repeat: the number of timed runs.
+    """
+    history = list() if tracking else None
+    stats = spu.SudokuStats()
+    stats.setUnknowns(unknowns)
+
+    # Time runs on fresh copies of the puzzle, then solve it once more to count guesses and backtracks
+    stats.registerExecutionTimes(*bm.timeSolver(solver, board, validValues, searchMode, guessMode, warmup, repeat))
+    solver(board, validValues, history, stats, searchMode, guessMode)
+
+    return spu.toStr(board), history, stats
+
+# Solve function and settings of the process solving puzzles, set by initWorker
+workerSettings = None
+
+def initWorker(alg: int, searchMode: int, guessMode: int, rules: list[str] | None, tracking: bool, warmup: int, repeat: int):
+    """
+    Prepares the current process, or a worker process of the pool, to solve puzzles.
+    Arguments:
+        alg: identifier for solution algorithm.
+        searchMode: defines how missing values are searched.
+        guessMode: defines how guesses are made.
+        rules: the rules applied by the rule-based algorithms besides singles, the algorithm default when None.
+        tracking: whether the history of solutions is kept.
+        warmup: the number of untimed runs of each puzzle before timing.
+        repeat: the number of timed runs of each puzzle.
+    """
+    global workerSettings
+    workerSettings = (getSolver(alg, rules), searchMode, guessMode, tracking, warmup, repeat)
+
+def solveInWorker(puzzle: str) -> tuple[str, str | None, list[str] | None, spu.SudokuStats | Exception]:
+    """
+    Solves a single puzzle with the settings given to initWorker. Returns the puzzle, the solution, the tracking
+    history and the statistics, or the puzzle and the error raised while solving it.
+    Arguments:
+        puzzle: the puzzle in 81 digit string format.
+    """
+    try:
+        return (puzzle,) + solvePuzzle(puzzle, *workerSettings)
+    except Exception as e:
+        return puzzle, None, None, e
+
 def solve(  puzzlesFileName: str, solutionsFileName: str, statsFileName: str, trackingFileName: str, errorsFileName: str, \
-            offset: int, limit: int, alg: int, searchMode: int, guessMode: int):
+            offset: int, limit: int, alg: int, searchMode: int, guessMode: int, rules: list[str] | None = None, \
+            workers: int = 1, chunkSize: int = 64, warmup: int = 1, repeat: int = 5, flushRecords: int = 1024, flushInterval: float = 5.0, \
+            checkpointFileName: str | None = None, checkpointInterval: int = 1000, resume: bool = False, verify: bool = False, \
+            unique: bool = False, metricsPort: int | None = None, metricsFileName: str | None = None, detailedStats: bool = False):
     """
     Solves puzzles found in a file using backtracking algorithm.
     Arguments:
@@ -73,84 +196,264 @@ def solve(  puzzlesFileName: str, solutionsFileName: str, statsFileName: str, tr
         alg: identifier for solution algorithm.
         searchMode: defines how missing values are searched.
         guessMode: defines how guesses are made.
+        rules: the rules applied by the rule-based algorithms besides singles, the algorithm default when None.
+        workers: the number of processes solving puzzles, puzzles are solved in this process when 1.
+        chunkSize: the number of puzzles handed to a worker process at a time.
+        warmup: the number of untimed runs of each puzzle before timing.
+        repeat: the number of timed runs of each puzzle.
+        flushRecords: the number of buffered records written to an output file at once.
+        flushInterval: the maximum seconds records stay buffered before being written.
+        checkpointFileName: the file name where the progress of the run is saved, None for no checkpoints.
+        checkpointInterval: the number of puzzles solved between checkpoints.
+        resume: whether to continue from the checkpoint of a previous run with the same settings.
+        verify: whether to check that the solutions are valid and keep the clues of their puzzles.
+        unique: whether the puzzles are known to have a unique solution, so verified solutions are also compared with
+                the reference solutions of the puzzles file, if it has any.
+        metricsPort: the local port serving Prometheus metrics of the run, None for no endpoint.
+        metricsFileName: the textfile collector file where Prometheus metrics of the run are written, None for no file.
+        detailedStats: whether the hot path counters of each puzzle are added as extra stats columns.
     """
+    import os
     import tqdm
-    import timeit
+    import collections
+    import threading
+    import contextlib
+    import multiprocessing
 
+    # Count the puzzles using the line index of the file, or the record size of a packed file
+    puzzleCount = sio.getPuzzleCount(puzzlesFileName)
+    offset = min(max(offset or 0, 0), puzzleCount)
     if not limit:
-        limit = spu.getFileLineCount(puzzlesFileName)
-    else: limit = limit
+        limit = puzzleCount - offset
+    else: limit = min(limit, puzzleCount - offset)
 
-    i = 1
+    pool = None
+    stopReading = threading.Event()
+    queued = threading.Semaphore(max(workers, 1) * chunkSize * 2)
     try:
-        # Open statistics file and Write header row
-        if statsFileName is not None:
-            with open(statsFileName, "w", encoding="utf-8") as sf:
-                sf.write("Puzzle,Solution,Execution Time,Zeros,Guesses,Backtracks\n")
-
-        # Open puzzles and read till limit is reached.
-        with open(puzzlesFileName, "r", encoding="utf-8") as pf:
-            for line in tqdm.tqdm(pf, total=limit):
-                # Stop at limit
-                if (i>limit):
-                    break
-
-                # Create board and statistics
-                puzzle=line.strip()
-                board = spu.to2DArray(puzzle)
-                
-                history = list()
-                stats = spu.SudokuStats();
-                stats.setUnknowns(puzzle.count('0'))
-                validValues = spu.cacheValidValues(board)
-                if alg==1:
-                    stats.registerExecutionTime(timeit.timeit(lambda: bkSolver.solve(board, validValues, history, stats, searchMode, guessMode), number=1000))
-                elif alg==2:
-                    stats.registerExecutionTime(timeit.timeit(lambda: rbSolver.solve(board, validValues, history, stats, searchMode, guessMode), number=1000))
-                else: raise ValueError("Unrecognized algorithm identifier: {}\n".format(alg))
-                
-                # Write solution
-                if solutionsFileName is not None:
-                    with open(solutionsFileName, "a", encoding="utf-8") as af:
-                        af.write("{}\n".format(spu.toStr(board)))
-
-                # Write history
-                if trackingFileName is not None:
-                    with open(trackingFileName, "a", encoding="utf-8") as tf:
-                        for j in range(len(history)):
-                            tf.write("{}\n".format(spu.toStr(history[j])))
-
-                # Write statistics
-                if statsFileName is not None:
-                    with open(statsFileName, "a", encoding="utf-8") as sf:
-                        sf.write("{},{},{:0.17f},{:0.0f},{:0.0f},{:0.0f}\n"\
-                            .format(puzzle, spu.toStr(board), stats.executionTime, stats.unknowns, stats.guesses, stats.backtracks))
-                
-                i+=1
+        tracking = trackingFileName is not None
+        settings = {"puzzles": os.path.abspath(puzzlesFileName), "offset": offset, "limit": limit, "alg": alg, \
+                    "searchMode": searchMode, "guessMode": guessMode, "rules": rules}
+        outputFileNames = {"solutions": solutionsFileName, "tracking": trackingFileName, "stats": statsFileName}
+
+        # Output files are cut back to their checkpointed size on resume, which compressed files do not allow
+        if checkpointFileName is not None and any(name is not None and sio.isCompressed(name) for name in outputFileNames.values()):
+            raise ValueError("Checkpoints need uncompressed solutions, tracking and stats files\n")
+
+        # Continue after the last checkpointed puzzle, dropping whatever was written after it
+        completed = 0
+        checkpoint = sio.loadCheckpoint(checkpointFileName) if resume and checkpointFileName is not None else None
+        if resume and checkpoint is None:
+            # Appending to the outputs of an unknown previous run would mix them with this one
+            raise ValueError("No checkpoint {} to resume from, run without --resume to start over\n".format(checkpointFileName))
+        if checkpoint is not None:
+            if checkpoint["settings"] != settings:
+                raise ValueError("Checkpoint {} was saved by a run with different settings: {}\n".format(checkpointFileName, checkpoint["settings"]))
+
+            completed = checkpoint["completed"]
+            for name, position in checkpoint["positions"].items():
+                if outputFileNames[name] is not None:
+                    os.truncate(outputFileNames[name], position)
+
+        with contextlib.ExitStack() as outputs:
+            # Keep the output files open for the whole run, stats start with a header row
+            writers = dict[str, sio.RecordWriter]()
+            if solutionsFileName is not None:
+                writers["solutions"] = solutionsWriter = outputs.enter_context(sio.RecordWriter(solutionsFileName, "a", None, flushRecords, flushInterval))
+            if trackingFileName is not None:
+                writers["tracking"] = trackingWriter = outputs.enter_context(sio.RecordWriter(trackingFileName, "a", None, flushRecords, flushInterval))
+            if statsFileName is not None:
+                if checkpoint is not None:
+                    statsWriter = sio.RecordWriter(statsFileName, "a", None, flushRecords, flushInterval)
+                else:
+                    header = "Puzzle,Solution,Execution Time,Zeros,Guesses,Backtracks,Execution Time Min,Execution Time P95"
+                    if detailedStats:
+                        header += "," + ",".join(spu.STATS_DETAIL_COLUMNS)
+                    statsWriter = sio.RecordWriter(statsFileName, "w", header, flushRecords, flushInterval)
+                writers["stats"] = outputs.enter_context(statsWriter)
+
+            # Solutions are checked in batches, each wrong solution is saved as an error
+            toVerify = list[tuple[int, str, str, str | None]]()
+            verified = 0
+            mismatches = 0
+            def verifyQueued():
+                nonlocal verified, mismatches
+                invalid, differ = sio.verifySolutions([item[1] for item in toVerify], [item[2] for item in toVerify], \
+                    [item[3] for item in toVerify], unique)
+                for i in invalid:
+                    number, puzzle, solution, reference = toVerify[i]
+                    spu.saveError(ValueError("Solution {} is not a valid solution of the puzzle".format(solution)), \
+                        errorsFileName, "puzzle {} ({})".format(number, puzzle))
+                for i in differ:
+                    number, puzzle, solution, reference = toVerify[i]
+                    spu.saveError(ValueError("Solution {} differs from the unique reference solution {}".format(solution, reference)), \
+                        errorsFileName, "puzzle {} ({})".format(number, puzzle))
+                verified += len(toVerify)
+                mismatches += len(invalid) + len(differ)
+                toVerify.clear()
+
+            # Counters of the whole run, merged from the stats of every puzzle
+            runStats = spu.SudokuStats()
+
+            # Export throughput and latency while the run goes on
+            metrics = None
+            if metricsPort is not None or metricsFileName is not None:
+                import solverMetrics
+                metrics = solverMetrics.SolverMetrics(getAlg(alg), searchMode, guessMode, metricsPort, metricsFileName, flushInterval)
+                outputs.callback(metrics.write)
+
+            def saveProgress():
+                verifyQueued()
+                positions = {name: writer.getPosition() for name, writer in writers.items()}
+                sio.saveCheckpoint(checkpointFileName, {"settings": settings, "completed": completed, "positions": positions})
+
+            # Record where this run starts writing, so a resume before the first interval drops only its own output
+            if checkpointFileName is not None and checkpoint is None:
+                saveProgress()
+
+            # Open puzzles at the next puzzle to solve and read till limit is reached.
+            rows = outputs.enter_context(sio.openPuzzles(puzzlesFileName, offset + completed, offset + limit))
+
+            # Keep the reference solutions, in order, for the puzzles handed to the solver. Puzzles read ahead of
+            # the solver are bounded, as the pool would otherwise queue the whole file.
+            references = collections.deque()
+            def readPuzzles():
+                for puzzle, reference in rows:
+                    queued.acquire()
+                    if stopReading.is_set():
+                        return
+                    references.append(reference)
+                    yield puzzle
+            puzzles = readPuzzles()
+
+            # Solve in this process or shard the puzzles across a pool, results come back in input order
+            if workers > 1:
+                pool = multiprocessing.Pool(workers, initializer=initWorker, initargs=(alg, searchMode, guessMode, rules, tracking, warmup, repeat))
+                results = pool.imap(solveInWorker, puzzles, chunksize=chunkSize)
+            else:
+                initWorker(alg, searchMode, guessMode, rules, tracking, warmup, repeat)
+                results = map(solveInWorker, puzzles)
+
+            for puzzle, solution, history, stats in tqdm.tqdm(results, total=limit, initial=completed):
+                completed += 1
+                reference = references.popleft()
+                queued.release()
+
+                # Record a puzzle which failed and carry on with the next one
+                if isinstance(stats, Exception):
+                    spu.saveError(stats, errorsFileName, "puzzle {} ({})".format(offset + completed, puzzle))
+                    if metrics is not None:
+                        metrics.observeFailed(len(references))
+                else:
+                    if metrics is not None:
+                        metrics.observeSolved(stats.executionTime, stats.guesses, stats.backtracks, len(references))
+
+                    # Write solution
+                    if solutionsFileName is not None:
+                        solutionsWriter.write(solution)
+
+                    # Write history
+                    if trackingFileName is not None:
+                        trackingWriter.writeAll(history)
+
+                    # Write statistics
+                    if statsFileName is not None:
+                        record = "{},{},{:0.17f},{:0.0f},{:0.0f},{:0.0f},{:0.17f},{:0.17f}"\
+                            .format(puzzle, solution, stats.executionTime, stats.unknowns, stats.guesses, stats.backtracks, \
+                                stats.executionTimeMin, stats.executionTimeP95)
+                        if detailedStats:
+                            record += "," + ",".join(stats.getDetailColumns())
+                        statsWriter.write(record)
+
+                    if detailedStats:
+                        runStats.merge(stats)
+
+                    # Queue the solution to be checked
+                    if verify:
+                        toVerify.append((offset + completed, puzzle, solution, reference))
+                        if len(toVerify) >= sio.VERIFY_BATCH_SIZE:
+                            verifyQueued()
+
+                if checkpointFileName is not None and completed % checkpointInterval == 0:
+                    saveProgress()
+
+            if detailedStats:
+                print("Guesses {:0.0f}, backtracks {:0.0f}, isValid calls {:0.0f}, findEmpty scans {:0.0f}, eliminations {:0.0f}, max depth {:0.0f}."\
+                    .format(runStats.guesses, runStats.backtracks, runStats.isValidCalls, runStats.findEmptyScans, runStats.eliminations, runStats.maxDepth))
+
+            verifyQueued()
+            if verify:
+                print("Verified {:0.0f} solutions, {:0.0f} are wrong.".format(verified, mismatches))
+
+            if checkpointFileName is not None:
+                saveProgress()
 
     except Exception as e:
         spu.saveError(e, errorsFileName)
 
+    finally:
+        # Let the reading of puzzles end if it is waiting for the solver
+        stopReading.set()
+        queued.release()
+
+        if pool is not None:
+            pool.terminate()
+
 def main():
     import argparse
 
     # Register arguments
     parser = argparse.ArgumentParser();
-    parser.add_argument("puzzlesFileName", help="The file name of the sudoku puzzles dataset.", type=str)
+    parser.add_argument("puzzlesFileName", help="The file name of the sudoku puzzles dataset, either one puzzle per line, id, puzzle, solution rows or packed puzzles.", type=str)
     parser.add_argument("solutionsFileName", help="The file name where to save the sudoku solutions.", type=str)
     parser.add_argument("statsFileName", help="The file name where to save the sudoku stats.", type=str)
     parser.add_argument("trackingFileName", help="The file name of the tracking for the sudoku solutions.", type=str) 
     parser.add_argument("errorsFileName", help="The file name where to save the errors.", type=str)
     parser.add_argument("offset", help="The number of puzzles to offset from the file.", type=int)
     parser.add_argument("limit", help="The limit number of puzzles to solve.", type=int)
-    parser.add_argument("alg", help="The algorithm identifier.", type=int)
-    parser.add_argument("search", help="Defines how the puzzle is parsed: 1 by row; 2 by col; 3 by box sequentially; 4 by box in a zig-zag; 5 by box in a spiral; 6 by box in a semi-zig-zag.", type=int)
+    parser.add_argument("alg", help="The algorithm identifier: 1 backtracking; 2 rules; 3 iterative backtracking; 4 dancing links; 5 rules with propagation at every guess.", type=int)
+    parser.add_argument("search", help="Defines how the puzzle is parsed: 1 by row; 2 by col; 3 random; 4 by box sequentially; 5 by box in a zig-zag; 6 by box in a spiral; 7 by box in a semi-zig-zag; 8 by box randomly; 9 by box diagonal; 10 most constrained; 11 most constrained by degree; 12 most constrained randomly.", type=int)
     parser.add_argument("guess", help="defines how numbers are guessed: 1 sequentially; 2 randomly.", type=int)
+    parser.add_argument("--rules", help="Comma separated rules applied by the rule-based algorithms besides singles, or none: {}. By default none for rules and all for rules with propagation.".format(", ".join(rbSolver.RULES)), type=str, default=None)
+    parser.add_argument("--workers", help="The number of processes solving puzzles in parallel.", type=int, default=1)
+    parser.add_argument("--chunk-size", help="The number of puzzles handed to a worker process at a time.", type=int, default=64)
+    parser.add_argument("--warmup", help="The number of untimed runs of each puzzle before timing.", type=int, default=1)
+    parser.add_argument("--repeat", help="The number of timed runs of each puzzle.", type=int, default=5)
+    parser.add_argument("--flush-records", help="The number of buffered records written to an output file at once.", type=int, default=1024)
+    parser.add_argument("--flush-interval", help="The maximum seconds records stay buffered before being written.", type=float, default=5.0)
+    parser.add_argument("--checkpoint", help="The file name where the progress of the run is saved.", type=str, default=None)
+    parser.add_argument("--checkpoint-interval", help="The number of puzzles solved between checkpoints.", type=int, default=1000)
+    parser.add_argument("--resume", help="Continue from the checkpoint of a previous run with the same settings.", action="store_true")
+    parser.add_argument("--metrics-port", help="The local port serving Prometheus metrics of the run.", type=int, default=None)
+    parser.add_argument("--metrics-file", help="The textfile collector file where Prometheus metrics of the run are written.", type=str, default=None)
+    parser.add_argument("--detailed-stats", help="Add the hot path counters of each puzzle as extra stats columns.", action="store_true")
+    parser.add_argument("--verify", help="Check that the solutions are valid and keep the clues of their puzzles.", action="store_true")
+    parser.add_argument("--unique", help="The puzzles have a unique solution, so verified solutions are also compared with the reference solutions of an id, puzzle, solution file.", action="store_true")
 
     args = parser.parse_args()
+
+    rules = None
+    if args.rules is not None:
+        rules = [rule.strip() for rule in args.rules.split(",") if rule.strip() and rule.strip() != "none"]
+        for rule in rules:
+            if rule not in rbSolver.RULES:
+                parser.error("Unrecognized rule: {}".format(rule))
+    if args.workers < 1:
+        parser.error("The number of workers must be at least 1")
+    if args.warmup < 0 or args.repeat < 1:
+        parser.error("The warmup must not be negative and the repeat must be at least 1")
+    if args.resume and args.checkpoint is None:
+        parser.error("--resume needs the --checkpoint file of the previous run")
+    if args.checkpoint_interval < 1:
+        parser.error("The checkpoint interval must be at least 1")
+    if args.unique and not args.verify:
+        parser.error("--unique needs --verify")
     solve(puzzlesFileName=args.puzzlesFileName, solutionsFileName=args.solutionsFileName, statsFileName=args.statsFileName, \
         trackingFileName=args.trackingFileName, errorsFileName=args.errorsFileName, offset=args.offset, limit=args.limit, \
-            alg=args.alg, searchMode=args.search, guessMode=args.guess)
+            alg=args.alg, searchMode=args.search, guessMode=args.guess, rules=rules, workers=args.workers, chunkSize=args.chunk_size, \
+            warmup=args.warmup, repeat=args.repeat, flushRecords=args.flush_records, flushInterval=args.flush_interval, \
+            checkpointFileName=args.checkpoint, checkpointInterval=args.checkpoint_interval, resume=args.resume, verify=args.verify, \
+            unique=args.unique, metricsPort=args.metrics_port, metricsFileName=args.metrics_file, detailedStats=args.detailed_stats)
 
 if (__name__=="__main__"):
     main()
\ No newline at end of file
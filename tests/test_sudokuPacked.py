@@ -0,0 +1,20 @@
+import sudokuPacked as sp
+
+PUZZLES = [
+    "530070000600195000098000060800060003400803001700020006060000280000419005000080079",
+    "000000010400000000020000000000050407008000300001090000300400200050100000000806000",
+]
+
+def test_close_with_view_alive(tmp_path):
+    fileName = str(tmp_path / "puzzles.sdkp")
+    sp.writePacked(fileName, PUZZLES)
+
+    reader = sp.PackedReader(fileName)
+    records = reader.records
+    grids = reader.getGrids()
+    reader.close()
+
+    # The views taken before close still read the puzzles
+    assert sp.unpack(records[1].tobytes()) == PUZZLES[1]
+    assert "".join(map(str, grids[0])) == PUZZLES[0]
+    assert reader.file.closed